@@ -0,0 +1,27 @@
+"""
+Офлайн-анализ трассировки, выгруженной из main.py через export_trace.
+Файл читается потоком, поэтому подходит для больших перечислений.
+
+Пример:
+    python analyze_trace.py trace.jsonl --log 30
+"""
+
+import argparse
+
+from main import analyze_trace_file, print_detailed_log, read_trace
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Анализ файла трассировки (JSONL или JSONL.gz)")
+    parser.add_argument('path', help="путь к файлу трассировки")
+    parser.add_argument('--log', type=int, default=0, metavar='N',
+                        help="дополнительно вывести первые N шагов детального лога")
+    args = parser.parse_args()
+
+    analyze_trace_file(args.path)
+    if args.log > 0:
+        print_detailed_log(args.log, read_trace(args.path, 'step'))
+
+
+if __name__ == "__main__":
+    main()
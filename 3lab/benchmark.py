@@ -0,0 +1,174 @@
+"""
+Замеры производительности генераторов перестановок и комбинаций (лабораторная №3).
+
+Сравниваются движки:
+    traced    - рекурсивные generate_* с трассировкой на каждом уровне TRACE_*
+    lazy      - индексный движок iter_*
+    array     - выгрузка в массив NumPy (если NumPy установлен)
+    parallel  - parallel_* со свёрткой CountFold в пуле процессов
+    itertools - эталон из стандартной библиотеки
+
+Для каждого замера: результатов в секунду, пиковая память (tracemalloc,
+только текущий процесс) и объём журнала в байтах JSON на один результат.
+
+Пример:
+    python benchmark.py --min-n 3 --max-n 10 --output bench.json
+"""
+
+import argparse
+import itertools
+import json
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from main import (
+    TRACE_OFF, TRACE_STEPS, TRACE_FULL, TraceContext, CountFold, np,
+    generate_permutations, generate_combinations, iter_permutations, iter_combinations,
+    permutations_array, combinations_array, parallel_permutations, parallel_combinations
+)
+
+
+TRACE_LEVELS = {'off': TRACE_OFF, 'steps': TRACE_STEPS, 'full': TRACE_FULL}
+
+
+def _count(items) -> int:
+    """Количество результатов: длина списка/массива или проход по итератору"""
+    if hasattr(items, '__len__'):
+        return len(items)
+    return sum(1 for _ in items)
+
+def _log_bytes(trace: TraceContext) -> int:
+    """Объём журнала в байтах, если выгрузить его в JSONL"""
+    total = 0
+    for entry in itertools.chain(trace.execution_log, trace.partial_results):
+        total += len(json.dumps(entry, ensure_ascii=False, default=repr).encode('utf-8')) + 1
+    return total
+
+def measure(run: Callable[[], object], memory: bool,
+            trace_level: Optional[int] = None) -> Dict:
+    """
+    Один замер: время (без tracemalloc), затем при memory=True
+    повторный прогон под tracemalloc для пиковой памяти.
+    """
+    trace = TraceContext(level=trace_level if trace_level is not None else TRACE_OFF)
+    with trace:
+        start = time.perf_counter()
+        results = _count(run())
+        seconds = time.perf_counter() - start
+    record = {
+        'results': results,
+        'seconds': seconds,
+        'results_per_sec': results / seconds if seconds > 0 else None,
+        'log_bytes_per_result': _log_bytes(trace) / results if results else 0,
+        'peak_bytes': None
+    }
+    del trace
+    if memory:
+        tracemalloc.start()
+        with TraceContext(level=trace_level if trace_level is not None else TRACE_OFF):
+            _count(run())
+            record['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return record
+
+def permutation_engines(n: int, args) -> Dict[str, Callable[[], object]]:
+    """Движки перестановок, применимые для данного n"""
+    data = list(range(n))
+    engines = {
+        'lazy': lambda: iter_permutations(data),
+        'itertools': lambda: itertools.permutations(data),
+    }
+    if np is not None:
+        engines['array'] = lambda: permutations_array(data, indices=True)
+    if n >= args.min_parallel_n:
+        engines['parallel'] = lambda: range(parallel_permutations(data, fold=CountFold(),
+                                                                  workers=args.workers))
+    return engines
+
+def combination_engines(n: int, r: int, args) -> Dict[str, Callable[[], object]]:
+    """Движки комбинаций, применимые для данных n и r"""
+    data = list(range(n))
+    engines = {
+        'lazy': lambda: iter_combinations(data, r),
+        'itertools': lambda: itertools.combinations(data, r),
+    }
+    if np is not None:
+        engines['array'] = lambda: combinations_array(data, r, indices=True)
+    if n >= args.min_parallel_n:
+        engines['parallel'] = lambda: range(parallel_combinations(data, r, fold=CountFold(),
+                                                                  workers=args.workers))
+    return engines
+
+def r_values(n: int, requested: Optional[List[int]]) -> List[int]:
+    """Размеры комбинаций: заданные явно или 1, n/2 и n-1"""
+    if requested:
+        return [r for r in requested if 0 <= r <= n]
+    return sorted({1, n // 2, max(n - 1, 1)})
+
+def run_benchmarks(args) -> List[Dict]:
+    """Все замеры по сетке n, r, движков и уровней трассировки"""
+    records = []
+
+    def add(kind: str, engine: str, n: int, r: int, level: Optional[str],
+            run: Callable[[], object]):
+        record = {'kind': kind, 'engine': engine, 'n': n, 'r': r, 'trace_level': level}
+        level_value = TRACE_LEVELS[level] if level else None
+        record.update(measure(run, not args.no_memory, level_value))
+        records.append(record)
+        rate = record['results_per_sec']
+        print(f"{kind:12s} {engine:10s} n={n:2d} r={r:2d} trace={level or '-':5s} "
+              f"{record['results']:>10d} рез. {rate or 0:>14,.0f} рез/с "
+              f"журнал {record['log_bytes_per_result']:>8.1f} Б/рез", file=sys.stderr)
+
+    for n in range(args.min_n, args.max_n + 1):
+        if n <= args.max_traced_n:
+            for level in args.trace_levels:
+                add('permutations', 'traced', n, n, level,
+                    lambda: generate_permutations(list(range(n))))
+        for engine, run in permutation_engines(n, args).items():
+            add('permutations', engine, n, n, None, run)
+
+        for r in r_values(n, args.r):
+            if n <= args.max_traced_n:
+                for level in args.trace_levels:
+                    add('combinations', 'traced', n, r, level,
+                        lambda: generate_combinations(list(range(n)), r))
+            for engine, run in combination_engines(n, r, args).items():
+                add('combinations', engine, n, r, None, run)
+    return records
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры генераторов перестановок и комбинаций")
+    parser.add_argument('--min-n', type=int, default=3)
+    parser.add_argument('--max-n', type=int, default=11)
+    parser.add_argument('--max-traced-n', type=int, default=8,
+                        help="наибольшее n для движка с трассировкой (журнал растёт как n!)")
+    parser.add_argument('--min-parallel-n', type=int, default=8,
+                        help="наименьшее n для параллельного движка")
+    parser.add_argument('--r', type=int, nargs='*', help="размеры комбинаций (по умолчанию 1, n/2, n-1)")
+    parser.add_argument('--trace-levels', nargs='*', choices=list(TRACE_LEVELS),
+                        default=list(TRACE_LEVELS))
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--no-memory', action='store_true',
+                        help="не замерять пиковую память (вдвое быстрее)")
+    parser.add_argument('--output', help="файл для результатов JSON (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    records = run_benchmarks(args)
+    report = {
+        'python': sys.version.split()[0],
+        'numpy': np.__version__ if np is not None else None,
+        'results': records
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
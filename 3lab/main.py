@@ -2,68 +2,358 @@
 Лабораторная работа №3: Генерация перестановок и комбинаций
 """
 
-from typing import List, Dict, Any
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Tuple, Iterator, Callable, Optional
 from datetime import datetime
+from fractions import Fraction
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from concurrent.futures import ProcessPoolExecutor
+import gzip
+import itertools
+import json
+import math
+import os
+import sys
+import tempfile
+import threading
 
+try:
+    import numpy as np
+except ImportError:  # NumPy нужен только для выгрузки в массивы
+    np = None
 
-# ГЛОБАЛЬНЫЕ КОЛЛЕКЦИИ ДЛЯ ТРАССИРОВКИ
 
+# КОНТЕКСТ ТРАССИРОВКИ
 
-execution_log = []  # Шаги вычислений
-partial_results = []  # Частичные результаты
-final_results = []  # Итоговые комбинации
+
+TRACE_OFF = 0  # Ничего не записывается (кроме итоговых результатов и счётчиков)
+TRACE_STEPS = 1  # Только шаги вычислений
+TRACE_FULL = 2  # Шаги и частичные результаты
+
+class TraceContext:
+    """
+    Контекст трассировки: шаги вычислений, частичные и итоговые результаты,
+    счётчик отсечений и выгрузка в файл.
+    Активируется блоком with и хранится в contextvars, поэтому перечисления
+    в разных потоках и задачах asyncio пишут каждое в свой контекст без
+    блокировок. Вне блоков with используется общий контекст по умолчанию.
+    """
+
+    def __init__(self, level: int = TRACE_FULL):
+        self.level = level
+        self.export = None  # Файл, в который записи выгружаются по мере выполнения
+        self.keep_in_memory = True  # Дублировать ли выгружаемые записи в коллекции
+        self._tokens = []
+        self.clear()
+
+    def clear(self):
+        """Очистка коллекций и счётчиков (выгрузка в файл не прерывается)"""
+        self.execution_log = []  # Шаги вычислений
+        self.partial_results = []  # Частичные результаты
+        self.final_results = []  # Итоговые комбинации
+        self.pruned_nodes = 0  # Поддеревья, отсечённые ограничениями
+        self.cache_hits = 0  # Подзадачи, взятые из кэша
+        self.cache_misses = 0  # Подзадачи, посчитанные и положенные в кэш
+
+    def __enter__(self) -> 'TraceContext':
+        self._tokens.append(_current_trace.set(self))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_trace.reset(self._tokens.pop())
+        if not self._tokens:
+            stop_trace_export(self)
+
+
+_default_trace = TraceContext()
+_current_trace = ContextVar('trace', default=_default_trace)
+
+def current_trace() -> TraceContext:
+    """Активный контекст трассировки"""
+    return _current_trace.get()
+
+def __getattr__(name: str):
+    """Совместимость: execution_log и др. - коллекции активного контекста"""
+    if name in ('execution_log', 'partial_results', 'final_results', 'pruned_nodes'):
+        return getattr(current_trace(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def clear_collections():
     """Очистка всех коллекций"""
-    global execution_log, partial_results, final_results
-    execution_log = []
-    partial_results = []
-    final_results = []
+    current_trace().clear()
 
-def log_step(action: str, data: dict = None):
-    """Запись шага вычисления"""
+def log_step(action: str, data: dict = None, trace: Optional[TraceContext] = None):
+    """Запись шага вычисления (по умолчанию - в активный контекст)"""
+    if trace is None:
+        trace = _current_trace.get()
+    if trace.level < TRACE_STEPS:
+        return
     if data is None:
         data = {}
-    execution_log.append({
+    entry = {
         'action': action,
         'data': data,
         'timestamp': datetime.now().isoformat()
-    })
+    }
+    if trace.export is not None:
+        _export_record(trace, 'step', entry)
+        if not trace.keep_in_memory:
+            return
+    trace.execution_log.append(entry)
 
 def save_partial_result(name: str, result: Any):
     """Сохранение частичного результата"""
-    partial_results.append({
+    trace = _current_trace.get()
+    if trace.level < TRACE_FULL:
+        return
+    entry = {
         'name': name,
         'result': result,
         'timestamp': datetime.now().isoformat()
-    })
+    }
+    if trace.export is not None:
+        _export_record(trace, 'partial', entry)
+        if not trace.keep_in_memory:
+            return
+    trace.partial_results.append(entry)
 
 def save_final_result(name: str, result: Any):
     """Сохранение итогового результата"""
-    final_results.append({
+    trace = _current_trace.get()
+    entry = {
         'name': name,
         'result': result,
         'count': len(result) if hasattr(result, '__len__') else 0
+    }
+    if trace.export is not None:
+        _export_record(trace, 'final', entry)
+        if not trace.keep_in_memory:
+            return
+    trace.final_results.append(entry)
+
+def _allowed(constraint: Optional[Callable[[Tuple], bool]], prefix: Tuple) -> bool:
+    """
+    Проверка частичного префикса ограничением.
+    При отказе всё поддерево отсекается и учитывается в pruned_nodes.
+    """
+    if constraint is None or constraint(prefix):
+        return True
+    _current_trace.get().pruned_nodes += 1
+    return False
+
+def _group_equal(elements: List) -> List:
+    """
+    Перестановка набора так, чтобы равные значения шли подряд
+    (в порядке первого появления). Нужна для комбинаций мультимножества.
+    """
+    groups = []
+    for element in elements:
+        for group in groups:
+            if group[0] == element:
+                group.append(element)
+                break
+        else:
+            groups.append([element])
+    return [element for group in groups for element in group]
+
+def log_prune(prefix: Tuple, depth: int):
+    """Запись отсечения поддерева"""
+    log_step('prune', {
+        'prefix': list(prefix),
+        'depth': depth
     })
 
 
+# ВЫГРУЗКА ТРАССИРОВКИ В ФАЙЛ
+
+
+def _open_trace(path: str, mode: str):
+    """Открытие файла трассировки (.gz сжимается прозрачно)"""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+def _export_record(trace: TraceContext, kind: str, entry: dict):
+    """Одна запись трассировки - одна строка JSON"""
+    record = {'type': kind}
+    record.update(entry)
+    trace.export.write(json.dumps(record, ensure_ascii=False, default=repr) + '\n')
+
+def start_trace_export(path: str, keep_in_memory: bool = False,
+                       trace: Optional[TraceContext] = None):
+    """
+    Начало выгрузки трассировки (по умолчанию - активного контекста) в файл JSONL.
+    Записи пишутся по мере выполнения; при keep_in_memory=False
+    они не накапливаются в execution_log/partial_results/final_results.
+    """
+    trace = trace or current_trace()
+    if trace.export is not None:
+        raise RuntimeError("Выгрузка трассировки уже запущена")
+    trace.export = _open_trace(path, 'w')
+    trace.keep_in_memory = keep_in_memory
+
+def stop_trace_export(trace: Optional[TraceContext] = None):
+    """Завершение выгрузки: итоговая запись со счётчиком отсечений и закрытие файла"""
+    trace = trace or current_trace()
+    if trace.export is None:
+        return
+    _export_record(trace, 'summary', {
+        'pruned_nodes': trace.pruned_nodes,
+        'cache_hits': trace.cache_hits,
+        'cache_misses': trace.cache_misses
+    })
+    trace.export.close()
+    trace.export = None
+    trace.keep_in_memory = True
+
+@contextmanager
+def export_trace(path: str, keep_in_memory: bool = False):
+    """Выгрузка трассировки активного контекста в файл на время блока with"""
+    trace = current_trace()
+    start_trace_export(path, keep_in_memory, trace)
+    try:
+        yield trace
+    finally:
+        stop_trace_export(trace)
+
+def read_trace(path: str, kind: Optional[str] = None) -> Iterator[dict]:
+    """Потоковое чтение записей трассировки из файла (по желанию - одного типа)"""
+    with _open_trace(path, 'r') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if kind is None or record.get('type') == kind:
+                yield record
+
+
+# КЭШ ПОДЗАДАЧ
+
+
+class SubResultCache:
+    """
+    LRU-кэш результатов подзадач с ограничением по памяти.
+    Результаты хранятся неизменяемыми кортежами кортежей, поэтому
+    одна запись безопасно разделяется между всеми ветвями перебора.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # ключ -> (результат, размер в байтах)
+
+    @staticmethod
+    def key(kind: str, elements: List, *params) -> Optional[Tuple]:
+        """Ключ подзадачи; None, если элементы нехешируемы и кэш неприменим"""
+        key = (kind, tuple(elements)) + params
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def get(self, key: Tuple) -> Optional[Tuple[Tuple, ...]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    # Размер кортежа из k элементов: заголовок плюс k указателей
+    _TUPLE_BYTES = sys.getsizeof(())
+    _POINTER_BYTES = sys.getsizeof((None,)) - sys.getsizeof(())
+
+    def put(self, key: Tuple, result: List[List]):
+        # Размер будущей записи считается по длинам, до создания кортежей:
+        # слишком большой результат отклоняется без копирования
+        if self._TUPLE_BYTES + self._POINTER_BYTES * len(result) > self.max_bytes:
+            return
+        size = (self._TUPLE_BYTES * (len(result) + 1)
+                + self._POINTER_BYTES * (len(result) + sum(map(len, result))))
+        if size > self.max_bytes:
+            return
+        value = tuple(tuple(item) for item in result)
+        if key in self._entries:
+            self.bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (value, size)
+        self.bytes += size
+        # Вытеснение давно не использованных записей
+        while self.bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.bytes -= evicted
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+def _cached_subresult(cache: Optional[SubResultCache], key: Optional[Tuple],
+                      depth: int) -> Optional[List[List]]:
+    """Результат подзадачи из кэша с записью шага 'cache_hit'"""
+    if cache is None or key is None:
+        return None
+    trace = _current_trace.get()
+    cached = cache.get(key)
+    if cached is None:
+        trace.cache_misses += 1
+        return None
+    trace.cache_hits += 1
+    log_step('cache_hit', {
+        'key': list(key[1]),
+        'count': len(cached),
+        'depth': depth
+    })
+    return [list(item) for item in cached]
+
+
 # РЕКУРСИВНЫЕ ФУНКЦИИ
 
 
-def generate_permutations(elements: List, depth: int = 0) -> List[List]:
+def generate_permutations(elements: List, depth: int = 0,
+                          constraint: Optional[Callable[[Tuple], bool]] = None,
+                          r: Optional[int] = None, unique: bool = False,
+                          cache: Optional[SubResultCache] = None,
+                          prefix: Tuple = ()) -> List[List]:
     """
     Генерация всех перестановок элементов.
     Фиксирует каждый шаг вычислений.
+    r - длина размещения P(n, r), по умолчанию используются все элементы.
+    unique - для мультимножества каждая различная перестановка выдаётся один раз.
+    constraint(prefix) проверяется на каждом частичном префиксе;
+    если он возвращает False, всё поддерево отсекается.
+    cache - кэш подзадач: перестановки одинаковых хвостов считаются один раз
+    (с constraint не используется, так как результат зависит от префикса).
     """
+    if r is None:
+        r = len(elements)
     log_step('start_permutations', {
         'elements': elements.copy() if elements else [],
+        'r': r,
         'depth': depth,
         'step': 'начало вычислений'
     })
     
     # Базовый случай
-    if len(elements) <= 1:
-        result = [elements]
+    if r == 0 or r > len(elements) or len(elements) <= 1:
+        result = [elements[:r]] if r <= len(elements) else []
+        if result and result[0] and not _allowed(constraint, prefix + tuple(result[0])):
+            log_prune(prefix + tuple(result[0]), depth)
+            return []
         log_step('base_case_permutations', {
             'elements': elements.copy() if elements else [],
             'result': result.copy(),
@@ -72,17 +362,40 @@ def generate_permutations(elements: List, depth: int = 0) -> List[List]:
         save_partial_result(f'базовый_случай_глубина_{depth}', result)
         return result
     
+    if constraint is not None:
+        cache = None
+    cache_key = SubResultCache.key('permutations', elements, r, unique) if cache else None
+    cached = _cached_subresult(cache, cache_key, depth)
+    if cached is not None:
+        return cached
+    
     all_permutations = []
     log_step('start_iterations', {
         'total_iterations': len(elements),
         'depth': depth
     })
     
+    seen_heads = []
     for i in range(len(elements)):
         # Шаг 1: Выбор головы
         head = elements[i]
         tail = elements[:i] + elements[i+1:]
         
+        # Равная голова на том же уровне дала бы те же перестановки
+        if unique:
+            if head in seen_heads:
+                log_step('skip_duplicate', {
+                    'head': head,
+                    'iteration': i,
+                    'depth': depth
+                })
+                continue
+            seen_heads.append(head)
+        
+        if not _allowed(constraint, prefix + (head,)):
+            log_prune(prefix + (head,), depth)
+            continue
+        
         log_step('select_head', {
             'head': head,
             'tail': tail.copy(),
@@ -98,7 +411,8 @@ def generate_permutations(elements: List, depth: int = 0) -> List[List]:
             'depth_after': depth + 1
         })
         
-        tail_permutations = generate_permutations(tail, depth + 1)
+        tail_permutations = generate_permutations(tail, depth + 1, constraint, r - 1, unique,
+                                                  cache, prefix + (head,))
         
         # Фиксация промежуточных результатов
         save_partial_result(f'перестановки_хвоста_{head}_глубина_{depth}', tail_permutations)
@@ -126,13 +440,28 @@ def generate_permutations(elements: List, depth: int = 0) -> List[List]:
         'step': 'завершение вычислений'
     })
     
+    if cache_key is not None:
+        cache.put(cache_key, all_permutations)
     return all_permutations
 
-def generate_combinations(elements: List, r: int, depth: int = 0) -> List[List]:
+def generate_combinations(elements: List, r: int, depth: int = 0,
+                          constraint: Optional[Callable[[Tuple], bool]] = None,
+                          repetition: bool = False, unique: bool = False,
+                          cache: Optional[SubResultCache] = None,
+                          prefix: Tuple = ()) -> List[List]:
     """
     Генерация всех комбинаций из r элементов.
     Фиксирует каждый шаг вычислений.
+    repetition - комбинации с повторениями (элемент можно брать несколько раз).
+    unique - для мультимножества каждая различная комбинация выдаётся один раз
+    (равные значения группируются в порядке первого появления).
+    constraint(prefix) проверяется на каждом частичном префиксе;
+    если он возвращает False, всё поддерево отсекается.
+    cache - кэш подзадач: комбинации одного и того же остатка (суффикса
+    с заданным r) считаются один раз (с constraint не используется).
     """
+    if unique and depth == 0:
+        elements = _group_equal(elements)
     log_step('start_combinations', {
         'elements': elements.copy() if elements else [],
         'r': r,
@@ -150,7 +479,7 @@ def generate_combinations(elements: List, r: int, depth: int = 0) -> List[List]:
         save_partial_result(f'базовый_случай_r0_глубина_{depth}', result)
         return result
     
-    if len(elements) < r:
+    if len(elements) < r and not (repetition and elements):
         result = []
         log_step('base_case_insufficient', {
             'elements': elements.copy() if elements else [],
@@ -160,6 +489,13 @@ def generate_combinations(elements: List, r: int, depth: int = 0) -> List[List]:
         save_partial_result(f'базовый_случай_недостаточно_глубина_{depth}', result)
         return result
     
+    if constraint is not None:
+        cache = None
+    cache_key = SubResultCache.key('combinations', elements, r, repetition, unique) if cache else None
+    cached = _cached_subresult(cache, cache_key, depth)
+    if cached is not None:
+        return cached
+    
     all_combinations = []
     log_step('start_combination_iterations', {
         'total_iterations': len(elements),
@@ -169,7 +505,22 @@ def generate_combinations(elements: List, r: int, depth: int = 0) -> List[List]:
     for i in range(len(elements)):
         # Шаг 1: Выбор текущего элемента
         current = elements[i]
-        remaining = elements[i+1:]
+        remaining = elements[i:] if repetition else elements[i+1:]
+        
+        # Равные значения сгруппированы, повтор дал бы те же комбинации
+        if unique and i > 0 and current == elements[i-1]:
+            log_step('skip_duplicate', {
+                'current': current,
+                'iteration': i,
+                'depth': depth
+            })
+            continue
+        
+        # Ветви, где не хватает элементов, ограничением не проверяются
+        enough = repetition or len(remaining) >= r - 1
+        if enough and not _allowed(constraint, prefix + (current,)):
+            log_prune(prefix + (current,), depth)
+            continue
         
         log_step('select_current', {
             'current': current,
@@ -187,7 +538,9 @@ def generate_combinations(elements: List, r: int, depth: int = 0) -> List[List]:
             'depth_after': depth + 1
         })
         
-        remaining_combinations = generate_combinations(remaining, r - 1, depth + 1)
+        remaining_combinations = generate_combinations(remaining, r - 1, depth + 1, constraint,
+                                                       repetition, unique, cache,
+                                                       prefix + (current,))
         
         # Фиксация промежуточных результатов
         save_partial_result(f'комбинации_остатка_{current}_глубина_{depth}', remaining_combinations)
@@ -215,70 +568,829 @@ def generate_combinations(elements: List, r: int, depth: int = 0) -> List[List]:
         'step': 'завершение вычислений'
     })
     
+    if cache_key is not None:
+        cache.put(cache_key, all_combinations)
     return all_combinations
 
 
+# ПОДСЧЁТ, РАНЖИРОВАНИЕ И ВОССТАНОВЛЕНИЕ ПО НОМЕРУ
+
+
+def _size(elements) -> int:
+    """Размер набора: принимает либо число n, либо сами элементы"""
+    return elements if isinstance(elements, int) else len(elements)
+
+def _multiplicities(elements) -> List[int]:
+    """Кратности различных значений мультимножества; число n - n различных элементов"""
+    if isinstance(elements, int):
+        return [1] * elements
+    grouped = _group_equal(elements)
+    counts = []
+    for i, element in enumerate(grouped):
+        if i > 0 and element == grouped[i-1]:
+            counts[-1] += 1
+        else:
+            counts.append(1)
+    return counts
+
+def count_permutations(elements, r: Optional[int] = None, unique: bool = False) -> int:
+    """
+    Количество перестановок без их генерации: n!, P(n, r),
+    а при unique - число различных перестановок мультимножества
+    (число n при unique означает n различных элементов).
+    """
+    n = _size(elements)
+    if r is None:
+        r = n
+    if not unique:
+        return math.perm(n, r)
+    # r! * [x^r] П(1 + x/1! + ... + x^m/m!) - экспоненциальная производящая функция
+    poly = [Fraction(1)]
+    for m in _multiplicities(elements):
+        factor = [Fraction(1, math.factorial(c)) for c in range(m + 1)]
+        product = [Fraction(0)] * min(len(poly) + m, r + 1)
+        for i, a in enumerate(poly):
+            for j, b in enumerate(factor[:len(product) - i]):
+                product[i + j] += a * b
+        poly = product
+    return int(poly[r] * math.factorial(r)) if r < len(poly) else 0
+
+def _multichoose(n: int, r: int) -> int:
+    """Число комбинаций с повторениями C(n+r-1, r)"""
+    if n == 0:
+        return 1 if r == 0 else 0
+    return math.comb(n + r - 1, r)
+
+def count_combinations(elements, r: int, repetition: bool = False, unique: bool = False) -> int:
+    """
+    Количество комбинаций без их генерации: C(n, r), с повторениями C(n+r-1, r),
+    а при unique - число различных комбинаций мультимножества
+    (число n при unique означает n различных элементов).
+    """
+    if not unique:
+        n = _size(elements)
+        return _multichoose(n, r) if repetition else math.comb(n, r)
+    counts = _multiplicities(elements)
+    if repetition:
+        return _multichoose(len(counts), r)
+    # [x^r] П(1 + x + ... + x^m) - обычная производящая функция
+    poly = [1]
+    for m in counts:
+        product = [0] * min(len(poly) + m, r + 1)
+        for i, a in enumerate(poly):
+            for j in range(min(m + 1, len(product) - i)):
+                product[i + j] += a
+        poly = product
+    return poly[r] if r < len(poly) else 0
+
+def _positions(elements: List, items) -> List[int]:
+    """
+    Перевод элементов в позиции исходного набора.
+    Для повторяющихся значений берётся первая ещё не занятая позиция.
+    """
+    used = [False] * len(elements)
+    positions = []
+    for item in items:
+        for i, element in enumerate(elements):
+            if not used[i] and element == item:
+                used[i] = True
+                positions.append(i)
+                break
+        else:
+            raise ValueError(f"Элемент {item!r} отсутствует в наборе {elements}")
+    return positions
+
+def rank_permutation(elements: List, permutation: List) -> int:
+    """
+    Номер перестановки в порядке generate_permutations (с нуля).
+    Факториальная система счисления (код Лемера), O(n²).
+    """
+    n = len(elements)
+    if len(permutation) != n:
+        raise ValueError(f"Перестановка {permutation} не соответствует набору {elements}")
+    positions = _positions(elements, permutation)
+    rank = 0
+    for i, pos in enumerate(positions):
+        smaller = sum(1 for other in positions[i+1:] if other < pos)
+        rank += smaller * math.factorial(n - 1 - i)
+    return rank
+
+def unrank_permutation(elements: List, k: int) -> List:
+    """
+    Перестановка с номером k в порядке generate_permutations.
+    Факториальная система счисления, O(n²), без перебора.
+    """
+    n = len(elements)
+    total = math.factorial(n)
+    if not 0 <= k < total:
+        raise ValueError(f"Номер перестановки {k} вне диапазона [0, {total})")
+    pool = list(elements)
+    permutation = []
+    for i in range(n, 0, -1):
+        digit, k = divmod(k, math.factorial(i - 1))
+        permutation.append(pool.pop(digit))
+    return permutation
+
+def rank_combination(elements: List, combination: List) -> int:
+    """
+    Номер комбинации в порядке generate_combinations (с нуля).
+    Комбинаторная система счисления, O(r) биномиальных коэффициентов.
+    """
+    n, r = len(elements), len(combination)
+    positions = sorted(_positions(elements, combination))
+    rank = 0
+    start = 0
+    for j, pos in enumerate(positions):
+        # Пропущенные комбинации, начинающиеся с позиций start..pos-1
+        # (сумма по «хоккейной клюшке»)
+        rank += math.comb(n - start, r - j) - math.comb(n - pos, r - j)
+        start = pos + 1
+    return rank
+
+def unrank_combination(elements: List, r: int, k: int) -> List:
+    """
+    Комбинация из r элементов с номером k в порядке generate_combinations.
+    Комбинаторная система счисления, O(n) биномиальных коэффициентов.
+    """
+    n = len(elements)
+    total = math.comb(n, r)
+    if not 0 <= k < total:
+        raise ValueError(f"Номер комбинации {k} вне диапазона [0, {total})")
+    combination = []
+    pos = 0
+    for j in range(r):
+        # Сколько комбинаций начинается с элемента на позиции pos
+        while True:
+            block = math.comb(n - pos - 1, r - j - 1)
+            if k < block:
+                break
+            k -= block
+            pos += 1
+        combination.append(elements[pos])
+        pos += 1
+    return combination
+
+
+# ЛЕНИВЫЕ ГЕНЕРАТОРЫ (ИНДЕКСНЫЙ ДВИЖОК БЕЗ КОПИРОВАНИЯ)
+
+
+def _inplace_permutations(elements: List, r: int, unique: bool,
+                          constraint: Optional[Callable[[Tuple], bool]],
+                          prefix: Tuple = ()) -> Iterator[Tuple]:
+    """
+    Перебор перестановок в одном буфере без срезов и рекурсии.
+    chosen[d] - позиция элемента, стоящего на уровне d, used - занятые позиции.
+    Порядок лексикографический по позициям, как у generate_permutations.
+    Последний уровень перебирается одним циклом: на каждый результат
+    создаётся один кортеж, он же проверяется ограничением.
+    Без ограничения и unique порядок совпадает с itertools.permutations,
+    и перебор отдаётся ему.
+    """
+    n = len(elements)
+    if r > n:
+        return
+    if constraint is None and not unique:
+        if prefix:
+            for item in itertools.permutations(elements, r):
+                yield prefix + item
+        else:
+            yield from itertools.permutations(elements, r)
+        return
+    base = len(prefix)
+    buf = list(prefix) + [None] * r
+    if r == 0:
+        yield tuple(buf)
+        return
+    used = [False] * n
+    chosen = [-1] * r
+    seen = [[] for _ in range(r)] if unique else None
+    last = r - 1
+    d = 0
+    while d >= 0:
+        if d == last:
+            # Последний уровень: все свободные позиции подряд
+            seen_values = seen[last] if unique else None
+            for i in range(n):
+                if used[i]:
+                    continue
+                value = elements[i]
+                if unique:
+                    if value in seen_values:
+                        continue
+                    seen_values.append(value)
+                buf[base + last] = value
+                item = tuple(buf)
+                if constraint is None or _allowed(constraint, item):
+                    yield item
+            if unique:
+                seen_values.clear()
+            d -= 1
+            continue
+        i = chosen[d]
+        if i >= 0:
+            used[i] = False
+        i += 1
+        while i < n:
+            if not used[i]:
+                value = elements[i]
+                # Равное значение на том же уровне дало бы те же перестановки
+                if unique and value in seen[d]:
+                    i += 1
+                    continue
+                if unique:
+                    seen[d].append(value)
+                buf[base + d] = value
+                if constraint is None or _allowed(constraint, tuple(buf[:base + d + 1])):
+                    break
+            i += 1
+        if i >= n:
+            # Уровень исчерпан - возврат на предыдущий
+            chosen[d] = -1
+            if unique:
+                seen[d].clear()
+            d -= 1
+            continue
+        chosen[d] = i
+        used[i] = True
+        d += 1
+
+def _inplace_combinations(elements: List, r: int, repetition: bool, unique: bool,
+                          constraint: Optional[Callable[[Tuple], bool]],
+                          prefix: Tuple = ()) -> Iterator[Tuple]:
+    """
+    Перебор комбинаций в одном буфере без срезов и рекурсии.
+    chosen[d] - позиция элемента на уровне d; при unique набор
+    должен быть уже сгруппирован (_group_equal). Последний уровень
+    перебирается одним циклом, без ограничения и unique перебор
+    отдаётся itertools.combinations(_with_replacement) с тем же порядком.
+    """
+    n = len(elements)
+    base = len(prefix)
+    if constraint is None and not unique:
+        combine = itertools.combinations_with_replacement if repetition else itertools.combinations
+        if prefix:
+            for item in combine(elements, r):
+                yield prefix + item
+        else:
+            yield from combine(elements, r)
+        return
+    buf = list(prefix) + [None] * r
+    if r == 0:
+        yield tuple(buf)
+        return
+    if (n == 0) if repetition else (r > n):
+        return
+    chosen = [-1] * r
+    last = r - 1
+    d = 0
+    while d >= 0:
+        if d == last:
+            # Последний уровень: позиции от следующей за уровнем выше до конца
+            start = 0 if d == 0 else (chosen[d-1] if repetition else chosen[d-1] + 1)
+            for i in range(start, n):
+                value = elements[i]
+                if unique and i > start and value == elements[i-1]:
+                    continue
+                buf[base + last] = value
+                item = tuple(buf)
+                if constraint is None or _allowed(constraint, item):
+                    yield item
+            d -= 1
+            continue
+        stop = n if repetition else n - r + d + 1
+        i = chosen[d]
+        if i < 0:
+            # Первый кандидат уровня - сразу после (или, с повторениями, на) позиции уровня выше
+            i = 0 if d == 0 else (chosen[d-1] if repetition else chosen[d-1] + 1)
+        else:
+            i += 1
+            while unique and i < stop and elements[i] == elements[i-1]:
+                i += 1
+        while i < stop:
+            buf[base + d] = elements[i]
+            if constraint is None or _allowed(constraint, tuple(buf[:base + d + 1])):
+                break
+            i += 1
+            while unique and i < stop and elements[i] == elements[i-1]:
+                i += 1
+        if i >= stop:
+            chosen[d] = -1
+            d -= 1
+            continue
+        chosen[d] = i
+        d += 1
+
+def iter_permutations(elements: List, prefix: Tuple = (),
+                      constraint: Optional[Callable[[Tuple], bool]] = None,
+                      r: Optional[int] = None, unique: bool = False) -> Iterator[Tuple]:
+    """
+    Ленивая генерация перестановок в порядке generate_permutations
+    (с теми же режимами r и unique).
+    Выдаёт кортежи по одному, не храня весь список и не записывая шаги
+    (отсечения ограничением только подсчитываются в pruned_nodes).
+    """
+    if r is None:
+        r = len(elements)
+    return _inplace_permutations(elements, r, unique, constraint, prefix)
+
+def iter_combinations(elements: List, r: int, prefix: Tuple = (),
+                      constraint: Optional[Callable[[Tuple], bool]] = None,
+                      repetition: bool = False, unique: bool = False) -> Iterator[Tuple]:
+    """
+    Ленивая генерация комбинаций в порядке generate_combinations
+    (с теми же режимами repetition и unique).
+    Выдаёт кортежи по одному, не храня весь список и не записывая шаги
+    (отсечения ограничением только подсчитываются в pruned_nodes).
+    """
+    if unique:
+        elements = _group_equal(elements)
+    return _inplace_combinations(elements, r, repetition, unique, constraint, prefix)
+
+
+# ВЫГРУЗКА В МАССИВЫ NUMPY
+
+
+def _canonical_positions(elements: List) -> List[int]:
+    """Для каждого элемента - позиция первого равного ему значения"""
+    canonical = []
+    for i, element in enumerate(elements):
+        for j in range(i):
+            if elements[j] == element:
+                canonical.append(canonical[j])
+                break
+        else:
+            canonical.append(i)
+    return canonical
+
+def _to_array(rows: Iterator[Tuple], count: Optional[int], width: int,
+              elements: List, indices: bool):
+    """
+    Сборка строк индексов в один непрерывный массив (count, width).
+    Если count известен заранее, массив заполняется без промежуточного списка.
+    """
+    if np is None:
+        raise ImportError("Для выгрузки в массив требуется NumPy: pip install numpy")
+    flat = itertools.chain.from_iterable(rows)
+    if width == 0:
+        table = np.empty((sum(1 for _ in rows), 0), dtype=np.intp)
+    elif count is None:
+        table = np.fromiter(flat, dtype=np.intp).reshape(-1, width)
+    else:
+        table = np.fromiter(flat, dtype=np.intp, count=count * width).reshape(count, width)
+    return table if indices else _element_array(elements)[table]
+
+def _element_array(elements: List):
+    """
+    Массив значений для индексации таблицей. Однотипные числа и строки
+    хранятся в своем dtype; смешанные типы - как object, чтобы NumPy
+    не приводил их к общему типу (1 и 'a' -> '1', 1 и 2.5 -> 1.0).
+    """
+    kinds = {type(element) for element in elements}
+    if len(kinds) == 1 and issubclass(kinds.pop(), (bool, int, float, complex, str, bytes, np.generic)):
+        return np.asarray(elements)
+    array = np.empty(len(elements), dtype=object)
+    for position, element in enumerate(elements):
+        array[position] = element  # поэлементно: кортежи равной длины не разворачиваются
+    return array
+
+def _index_constraint(elements: List, constraint: Optional[Callable[[Tuple], bool]]):
+    """Ограничение над значениями, применяемое к префиксу из позиций"""
+    if constraint is None:
+        return None
+    return lambda positions: constraint(tuple(elements[i] for i in positions))
+
+def permutations_array(elements: List, r: Optional[int] = None, unique: bool = False,
+                       constraint: Optional[Callable[[Tuple], bool]] = None,
+                       indices: bool = False):
+    """
+    Все перестановки одним массивом NumPy формы (P(n, r), r)
+    в порядке generate_permutations. Перебор идёт индексным движком
+    по позициям; при indices=True возвращаются сами позиции.
+    """
+    if r is None:
+        r = len(elements)
+    positions = _canonical_positions(elements) if unique else list(range(len(elements)))
+    rows = _inplace_permutations(positions, r, unique, _index_constraint(elements, constraint))
+    count = None if constraint else count_permutations(elements, r, unique)
+    return _to_array(rows, count, r, elements, indices)
+
+def combinations_array(elements: List, r: int, repetition: bool = False, unique: bool = False,
+                       constraint: Optional[Callable[[Tuple], bool]] = None,
+                       indices: bool = False):
+    """
+    Все комбинации одним массивом NumPy формы (C(n, r), r)
+    в порядке generate_combinations. При indices=True возвращаются позиции
+    (для unique - позиции в сгруппированном наборе).
+    """
+    if unique:
+        elements = _group_equal(elements)
+    positions = _canonical_positions(elements) if unique else list(range(len(elements)))
+    rows = _inplace_combinations(positions, r, repetition, unique,
+                                 _index_constraint(elements, constraint))
+    count = None if constraint else count_combinations(elements, r, repetition, unique)
+    return _to_array(rows, count, r, elements, indices)
+
+
+# ПАРАЛЛЕЛЬНЫЙ ПЕРЕБОР
+
+
+class Fold(ABC):
+    """
+    Свёртка результатов внутри процесса-обработчика.
+    initial() - начальное значение, step() - учёт одного результата,
+    merge() - объединение значений двух частей перебора.
+    Объект передаётся в процессы, поэтому должен быть сериализуем (pickle).
+    """
+
+    def initial(self) -> Any:
+        return None
+
+    @abstractmethod
+    def step(self, acc: Any, item: Tuple) -> Any:
+        """Значение свёртки после учёта результата item"""
+        pass
+
+    @abstractmethod
+    def merge(self, left: Any, right: Any) -> Any:
+        """Объединение значений свёртки двух частей перебора"""
+        pass
+
+class CountFold(Fold):
+    """Подсчёт количества результатов"""
+
+    def initial(self) -> int:
+        return 0
+
+    def step(self, acc: int, item: Tuple) -> int:
+        return acc + 1
+
+    def merge(self, left: int, right: int) -> int:
+        return left + right
+
+class FilterFold(Fold):
+    """Отбор результатов, удовлетворяющих предикату"""
+
+    def __init__(self, predicate: Callable[[Tuple], bool]):
+        self.predicate = predicate
+
+    def initial(self) -> List:
+        return []
+
+    def step(self, acc: List, item: Tuple) -> List:
+        if self.predicate(item):
+            acc.append(item)
+        return acc
+
+    def merge(self, left: List, right: List) -> List:
+        left.extend(right)
+        return left
+
+class MinByKeyFold(Fold):
+    """Минимальный по ключу результат: значение вида (ключ, результат) или None"""
+
+    def __init__(self, key: Callable[[Tuple], Any]):
+        self.key = key
+
+    def step(self, acc: Optional[Tuple], item: Tuple) -> Optional[Tuple]:
+        value = self.key(item)
+        if acc is None or value < acc[0]:
+            return (value, item)
+        return acc
+
+    def merge(self, left: Optional[Tuple], right: Optional[Tuple]) -> Optional[Tuple]:
+        if left is None:
+            return right
+        if right is None or left[0] <= right[0]:
+            return left
+        return right
+
+def _run_shard(items: Iterator[Tuple], fold: Optional[Fold]) -> Tuple[Any, int]:
+    """
+    Перебор одной части: список результатов или значение свёртки,
+    а также число отсечённых в этой части поддеревьев.
+    """
+    with TraceContext(level=TRACE_OFF) as trace:
+        if fold is None:
+            return list(items), trace.pruned_nodes
+        acc = fold.initial()
+        for item in items:
+            acc = fold.step(acc, item)
+        return acc, trace.pruned_nodes
+
+def _permutation_shard(elements: List, r: int, unique: bool, prefix: Tuple[int, ...],
+                       fold: Optional[Fold],
+                       constraint: Optional[Callable[[Tuple], bool]]) -> Tuple[Any, int]:
+    """Перестановки с фиксированным префиксом (позиции в elements)"""
+    head = tuple(elements[i] for i in prefix)
+    rest = [element for i, element in enumerate(elements) if i not in prefix]
+    items = iter_permutations(rest, head, constraint, r - len(prefix), unique)
+    return _run_shard(items, fold)
+
+def _combination_shard(elements: List, r: int, repetition: bool, unique: bool,
+                       prefix: Tuple[int, ...], fold: Optional[Fold],
+                       constraint: Optional[Callable[[Tuple], bool]]) -> Tuple[Any, int]:
+    """Комбинации с фиксированным префиксом (позиции в уже сгруппированном elements)"""
+    head = tuple(elements[i] for i in prefix)
+    rest = elements[prefix[-1]:] if repetition else elements[prefix[-1]+1:]
+    items = _inplace_combinations(rest, r - len(prefix), repetition, unique, constraint, head)
+    return _run_shard(items, fold)
+
+def _shard_prefixes(elements: List, depth: int, candidates: Callable[[Tuple[int, ...]], range],
+                    constraint: Optional[Callable[[Tuple], bool]]) -> List[Tuple[int, ...]]:
+    """
+    Префиксы частей перебора (позиции в elements) в порядке обхода.
+    Префиксы, отсечённые ограничением, в пул не отправляются.
+    """
+    shards = []
+
+    def walk(prefix: Tuple[int, ...]):
+        if prefix and not _allowed(constraint, tuple(elements[i] for i in prefix)):
+            return
+        if len(prefix) == depth:
+            shards.append(prefix)
+            return
+        for i in candidates(prefix):
+            walk(prefix + (i,))
+
+    walk(())
+    return shards
+
+def _shard_depth(total_shards: Callable[[int], int], max_depth: int, workers: int) -> int:
+    """Минимальная длина префикса, дающая хотя бы 4 части на процесс"""
+    depth = 1
+    while depth < max_depth and total_shards(depth) < workers * 4:
+        depth += 1
+    return depth
+
+def _run_parallel(name: str, submit_shard: Callable, shards: List[Tuple[int, ...]],
+                  fold: Optional[Fold], workers: int, trace: TraceContext):
+    """
+    Запуск частей в пуле процессов.
+    Результаты принимаются строго в порядке частей, поэтому общий порядок
+    совпадает с последовательным перебором. Одновременно в работе не более
+    2 * workers частей, чтобы готовые результаты не копились в памяти.
+    Записи идут в trace - контекст на момент вызова parallel_*, даже если
+    поток результатов дочитывается уже после выхода из его блока with.
+    """
+    log_step(f'start_parallel_{name}', {
+        'shards': len(shards),
+        'workers': workers,
+        'fold': type(fold).__name__ if fold else None
+    }, trace)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        shard_iter = iter(shards)
+        for shard in itertools.islice(shard_iter, workers * 2):
+            pending.append((shard, submit_shard(pool, shard)))
+        while pending:
+            shard, future = pending.popleft()
+            next_shard = next(shard_iter, None)
+            if next_shard is not None:
+                pending.append((next_shard, submit_shard(pool, next_shard)))
+            part, pruned = future.result()
+            trace.pruned_nodes += pruned
+            log_step('parallel_shard_done', {
+                'prefix': shard,
+                'count': len(part) if fold is None else None,
+                'pruned': pruned
+            }, trace)
+            yield part
+    log_step(f'end_parallel_{name}', {'shards': len(shards)}, trace)
+
+def _collect_parallel(parts: Iterator[Any], fold: Optional[Fold]):
+    """Поток результатов по порядку либо объединённое значение свёртки"""
+    if fold is None:
+        return (item for part in parts for item in part)
+    acc = fold.initial()
+    for part in parts:
+        acc = fold.merge(acc, part)
+    return acc
+
+def _collect_trivial(items: List[Tuple], fold: Optional[Fold]):
+    """Вырожденный случай (пустой перебор или одна пустая выборка) без пула процессов"""
+    if fold is None:
+        return iter(items)
+    acc = fold.initial()
+    for item in items:
+        acc = fold.step(acc, item)
+    return acc
+
+def _first_positions(elements: List, positions) -> List[int]:
+    """Первая позиция каждого различного значения среди positions"""
+    seen, first = [], []
+    for i in positions:
+        if elements[i] not in seen:
+            seen.append(elements[i])
+            first.append(i)
+    return first
+
+def parallel_permutations(elements: List, fold: Optional[Fold] = None,
+                          workers: Optional[int] = None, prefix_depth: Optional[int] = None,
+                          constraint: Optional[Callable[[Tuple], bool]] = None,
+                          r: Optional[int] = None, unique: bool = False):
+    """
+    Параллельная генерация перестановок в пуле процессов
+    (с теми же режимами r и unique, что и generate_permutations).
+    Пространство делится на части по префиксу длины prefix_depth.
+    Без fold возвращает итератор кортежей в порядке generate_permutations,
+    с fold - значение свёртки, посчитанной внутри процессов.
+    constraint, как и fold, передаётся в процессы и должен быть сериализуем.
+    """
+    workers = workers or os.cpu_count() or 1
+    n = len(elements)
+    if r is None:
+        r = n
+    if r == 0 or r > n:
+        return _collect_trivial([()] if r == 0 else [], fold)
+    if prefix_depth is None:
+        prefix_depth = _shard_depth(lambda d: math.perm(n, d), max(min(r, n - 1), 1), workers)
+    prefix_depth = max(1, min(prefix_depth, r))
+
+    def candidates(prefix: Tuple[int, ...]) -> List[int]:
+        free = [i for i in range(n) if i not in prefix]
+        return _first_positions(elements, free) if unique else free
+
+    shards = _shard_prefixes(elements, prefix_depth, candidates, constraint)
+    parts = _run_parallel(
+        'permutations',
+        lambda pool, shard: pool.submit(_permutation_shard, elements, r, unique, shard,
+                                        fold, constraint),
+        shards, fold, workers, current_trace()
+    )
+    return _collect_parallel(parts, fold)
+
+def parallel_combinations(elements: List, r: int, fold: Optional[Fold] = None,
+                          workers: Optional[int] = None, prefix_depth: Optional[int] = None,
+                          constraint: Optional[Callable[[Tuple], bool]] = None,
+                          repetition: bool = False, unique: bool = False):
+    """
+    Параллельная генерация комбинаций из r элементов в пуле процессов
+    (с теми же режимами repetition и unique, что и generate_combinations).
+    Пространство делится на части по первым prefix_depth выбранным элементам.
+    Без fold возвращает итератор кортежей в порядке generate_combinations,
+    с fold - значение свёртки, посчитанной внутри процессов.
+    constraint, как и fold, передаётся в процессы и должен быть сериализуем.
+    """
+    workers = workers or os.cpu_count() or 1
+    if unique:
+        elements = _group_equal(elements)
+    n = len(elements)
+    if r == 0 or (not elements if repetition else r > n):
+        return _collect_trivial([()] if r == 0 else [], fold)
+    if prefix_depth is None:
+        prefix_depth = _shard_depth(lambda d: math.comb(n - r + d, d), r, workers)
+    prefix_depth = max(1, min(prefix_depth, r))
+
+    def candidates(prefix: Tuple[int, ...]) -> List[int]:
+        # Без повторений позиция допустима, если после неё хватает элементов на остаток
+        start = (prefix[-1] if repetition else prefix[-1] + 1) if prefix else 0
+        stop = n if repetition else n - r + len(prefix) + 1
+        return [i for i in range(start, stop)
+                if not (unique and i > start and elements[i] == elements[i-1])]
+
+    shards = _shard_prefixes(elements, prefix_depth, candidates, constraint)
+    parts = _run_parallel(
+        'combinations',
+        lambda pool, shard: pool.submit(_combination_shard, elements, r, repetition, unique,
+                                        shard, fold, constraint),
+        shards, fold, workers, current_trace()
+    )
+    return _collect_parallel(parts, fold)
+
+
 # ФУНКЦИИ АНАЛИЗА И ВЫВОДА
 
 
-def analyze_execution():
-    """Анализ выполнения и вывод статистики"""
-    print("\n" + "="*60)
-    print("АНАЛИЗ ВЫПОЛНЕНИЯ")
-    print("="*60)
-    
-    # Статистика по шагам вычислений
-    print(f"\nШАГИ ВЫЧИСЛЕНИЙ: {len(execution_log)} записей")
-    
-    # Группировка по действиям
-    action_counts = {}
-    for entry in execution_log:
+class TraceStatistics:
+    """
+    Потоковый подсчёт статистики трассировки.
+    Сами записи не хранятся: только счётчики и несколько примеров,
+    поэтому так же работает и для файлов любого размера.
+    """
+
+    def __init__(self):
+        self.steps = 0
+        self.action_counts = {}
+        self.max_depth = 0
+        self.partials = 0
+        self.partial_samples = []
+        self.finals = []
+        self.pruned_nodes = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def add_step(self, entry: dict):
+        self.steps += 1
         action = entry['action']
-        action_counts[action] = action_counts.get(action, 0) + 1
-    
-    print("\nРаспределение по действиям:")
-    for action, count in sorted(action_counts.items()):
-        print(f"  {action}: {count}")
-    
-    # Частичные результаты
-    print(f"\nЧАСТИЧНЫЕ РЕЗУЛЬТАТЫ: {len(partial_results)} записей")
-    if partial_results:
-        print("Примеры частичных результатов:")
-        for i, result in enumerate(partial_results[:5], 1):
-            name = result['name']
-            res = result['result']
-            if isinstance(res, list) and len(res) > 3:
-                res_preview = f"{res[:3]}... (всего {len(res)})"
-            else:
-                res_preview = res
-            print(f"  {i}. {name}: {res_preview}")
-    
-    # Итоговые результаты
-    print(f"\nИТОГОВЫЕ РЕЗУЛЬТАТЫ: {len(final_results)} записей")
-    for result in final_results:
-        print(f"\n  {result['name']}:")
-        print(f"    Количество: {result['count']}")
-        if result['count'] <= 10:
-            for i, item in enumerate(result['result'], 1):
-                print(f"      {i}. {item}")
-        else:
-            print(f"    Первые 5: {result['result'][:5]}")
-            print(f"    ... и еще {result['count'] - 5} элементов")
-    
-    # Глубина рекурсии
-    max_depth = 0
-    for entry in execution_log:
+        self.action_counts[action] = self.action_counts.get(action, 0) + 1
         if 'depth' in entry['data']:
-            max_depth = max(max_depth, entry['data']['depth'])
-    print(f"\nМАКСИМАЛЬНАЯ ГЛУБИНА РЕКУРСИИ: {max_depth}")
+            self.max_depth = max(self.max_depth, entry['data']['depth'])
+
+    def add_partial(self, entry: dict):
+        self.partials += 1
+        if len(self.partial_samples) < 5:
+            self.partial_samples.append(entry)
+
+    def add_final(self, entry: dict):
+        # Для вывода нужно не больше 10 первых элементов
+        self.finals.append({
+            'name': entry['name'],
+            'count': entry['count'],
+            'head': list(itertools.islice(entry['result'], 10))
+        })
+
+    def add_record(self, record: dict):
+        """Запись из файла трассировки (тип в поле 'type')"""
+        kind = record.get('type')
+        if kind == 'step':
+            self.add_step(record)
+        elif kind == 'partial':
+            self.add_partial(record)
+        elif kind == 'final':
+            self.add_final(record)
+        elif kind == 'summary':
+            self.pruned_nodes += record.get('pruned_nodes', 0)
+            self.cache_hits += record.get('cache_hits', 0)
+            self.cache_misses += record.get('cache_misses', 0)
 
-def print_detailed_log(limit: int = 20):
-    """Вывод детального лога выполнения"""
+    def report(self):
+        """Вывод статистики"""
+        print("\n" + "="*60)
+        print("АНАЛИЗ ВЫПОЛНЕНИЯ")
+        print("="*60)
+        
+        # Статистика по шагам вычислений
+        print(f"\nШАГИ ВЫЧИСЛЕНИЙ: {self.steps} записей")
+        
+        print("\nРаспределение по действиям:")
+        for action, count in sorted(self.action_counts.items()):
+            print(f"  {action}: {count}")
+        
+        # Частичные результаты
+        print(f"\nЧАСТИЧНЫЕ РЕЗУЛЬТАТЫ: {self.partials} записей")
+        if self.partial_samples:
+            print("Примеры частичных результатов:")
+            for i, result in enumerate(self.partial_samples, 1):
+                name = result['name']
+                res = result['result']
+                if isinstance(res, list) and len(res) > 3:
+                    res_preview = f"{res[:3]}... (всего {len(res)})"
+                else:
+                    res_preview = res
+                print(f"  {i}. {name}: {res_preview}")
+        
+        # Итоговые результаты
+        print(f"\nИТОГОВЫЕ РЕЗУЛЬТАТЫ: {len(self.finals)} записей")
+        for result in self.finals:
+            print(f"\n  {result['name']}:")
+            print(f"    Количество: {result['count']}")
+            if result['count'] <= 10:
+                for i, item in enumerate(result['head'], 1):
+                    print(f"      {i}. {item}")
+            else:
+                print(f"    Первые 5: {result['head'][:5]}")
+                print(f"    ... и еще {result['count'] - 5} элементов")
+        
+        # Глубина рекурсии
+        print(f"\nМАКСИМАЛЬНАЯ ГЛУБИНА РЕКУРСИИ: {self.max_depth}")
+        print(f"ОТСЕЧЕНО ПОДДЕРЕВЬЕВ ОГРАНИЧЕНИЯМИ: {self.pruned_nodes}")
+        lookups = self.cache_hits + self.cache_misses
+        if lookups:
+            print(f"КЭШ ПОДЗАДАЧ: попаданий {self.cache_hits}, промахов {self.cache_misses}, "
+                  f"доля попаданий {self.cache_hits / lookups:.1%}")
+
+def analyze_execution(trace: Optional[TraceContext] = None):
+    """Анализ выполнения и вывод статистики (по умолчанию - активного контекста)"""
+    trace = trace or current_trace()
+    stats = TraceStatistics()
+    for entry in trace.execution_log:
+        stats.add_step(entry)
+    for entry in trace.partial_results:
+        stats.add_partial(entry)
+    for entry in trace.final_results:
+        stats.add_final(entry)
+    stats.pruned_nodes = trace.pruned_nodes
+    stats.cache_hits = trace.cache_hits
+    stats.cache_misses = trace.cache_misses
+    stats.report()
+
+def analyze_trace_file(path: str) -> TraceStatistics:
+    """Тот же анализ, что и analyze_execution, но потоком по файлу трассировки"""
+    stats = TraceStatistics()
+    for record in read_trace(path):
+        stats.add_record(record)
+    stats.report()
+    return stats
+
+def print_detailed_log(limit: int = 20, entries: Optional[Iterator[dict]] = None):
+    """Вывод детального лога выполнения (по умолчанию - активного контекста)"""
+    if entries is None:
+        entries = current_trace().execution_log
     print("\n" + "="*60)
     print("ДЕТАЛЬНЫЙ ЛОГ ВЫПОЛНЕНИЯ")
     print("="*60)
     
-    for i, entry in enumerate(execution_log[:limit], 1):
+    for i, entry in enumerate(itertools.islice(entries, limit), 1):
         action = entry['action']
         data = entry['data']
         
@@ -356,10 +1468,126 @@ if __name__ == "__main__":
     print(f"Первые 5 перестановок: {permutations[:5]}")
     
     analyze_execution()
-    
+
+    # Пример 4: Подсчёт и восстановление по номеру без перебора
+    print("\n\n" + "="*60)
+    print("ПРИМЕР 4: НОМЕР ПЕРЕСТАНОВКИ И КОМБИНАЦИИ БЕЗ ПЕРЕБОРА")
+    print("="*60)
+
+    letters = [chr(ord('a') + i) for i in range(20)]
+    k = 10**15
+    print(f"\nВсего перестановок из 20 элементов: {count_permutations(letters)}")
+    permutation = unrank_permutation(letters, k)
+    print(f"Перестановка №{k}: {''.join(permutation)}")
+    print(f"Обратно её номер: {rank_permutation(letters, permutation)}")
+    print(f"C(20, 5) = {count_combinations(letters, 5)}")
+    print(f"Комбинация №1000: {unrank_combination(letters, 5, 1000)}")
+
+    # Пример 5: Параллельный перебор
+    print("\n\n" + "="*60)
+    print("ПРИМЕР 5: ПАРАЛЛЕЛЬНЫЙ ПЕРЕБОР В ПУЛЕ ПРОЦЕССОВ")
+    print("="*60)
+
+    clear_collections()
+
+    test_data = list(range(8))
+    total = parallel_permutations(test_data, fold=CountFold())
+    print(f"\nПерестановок из {len(test_data)} элементов (подсчёт в процессах): {total}")
+    first = list(itertools.islice(parallel_combinations(test_data, 3), 5))
+    print(f"Первые 5 комбинаций C(8,3) потоком: {first}")
+    print(f"Шагов параллельного перебора в журнале: {len(current_trace().execution_log)}")
+
+    # Пример 6: Ограничения с отсечением поддеревьев
+    print("\n\n" + "="*60)
+    print("ПРИМЕР 6: КОМБИНАЦИИ С ОГРАНИЧЕНИЕМ НА СУММУ")
+    print("="*60)
+
+    clear_collections()
+
+    test_data = [1, 2, 3, 4, 5, 6]
+    limited = generate_combinations(test_data, 3, constraint=lambda prefix: sum(prefix) <= 9)
+    save_final_result("Комбинации C(6,3) с суммой <= 9", limited)
+    print_results("Комбинации с суммой не больше 9", limited)
+    print(f"Отсечено поддеревьев: {current_trace().pruned_nodes}")
+
+    # Пример 7: Мультимножества, размещения и комбинации с повторениями
+    print("\n\n" + "="*60)
+    print("ПРИМЕР 7: МУЛЬТИМНОЖЕСТВА И РАЗМЕЩЕНИЯ")
+    print("="*60)
+
+    clear_collections()
+
+    test_data = ['A', 'A', 'B']
+    distinct = generate_permutations(test_data, unique=True)
+    print_results("Различные перестановки AAB", distinct)
+    print(f"Подсчёт без перебора: {count_permutations(test_data, unique=True)}")
+
+    arrangements = generate_permutations(['X', 'Y', 'Z'], r=2)
+    print_results("Размещения P(3,2)", arrangements)
+
+    with_repetition = list(iter_combinations([1, 2, 3], 2, repetition=True))
+    print(f"\nКомбинации с повторениями из [1, 2, 3] по 2 "
+          f"({count_combinations(3, 2, repetition=True)}): {with_repetition}")
+
+    if np is not None:
+        table = permutations_array(['A', 'B', 'C', 'D'])
+        print(f"\nВсе перестановки ABCD одним массивом: форма {table.shape}, "
+              f"первые строки {table[:2].tolist()}")
+
+    # Пример 8: Выгрузка трассировки в файл и офлайн-анализ
+    print("\n\n" + "="*60)
+    print("ПРИМЕР 8: ВЫГРУЗКА ТРАССИРОВКИ В ФАЙЛ")
+    print("="*60)
+
+    clear_collections()
+
+    with tempfile.TemporaryDirectory() as directory:
+        trace_path = os.path.join(directory, 'lab3_trace.jsonl')
+        with export_trace(trace_path):
+            permutations = generate_permutations(['P', 'Q', 'R'])
+            save_final_result("Перестановки PQR", permutations)
+        print(f"\nТрассировка записана в {trace_path}, "
+              f"в памяти шагов: {len(current_trace().execution_log)}")
+        print(f"Анализ файла (то же делает: python analyze_trace.py {trace_path})")
+        analyze_trace_file(trace_path)
+        exported = {kind: sum(1 for _ in read_trace(trace_path, kind))
+                    for kind in ('step', 'partial', 'final')}
+
+    # Пример 9: Одновременные перечисления с отдельными контекстами
+    print("\n\n" + "="*60)
+    print("ПРИМЕР 9: ПАРАЛЛЕЛЬНЫЕ ПОТОКИ С ОТДЕЛЬНОЙ ТРАССИРОВКОЙ")
+    print("="*60)
+
+    def traced_run(data: List, traces: List):
+        with TraceContext() as trace:
+            generate_permutations(data)
+            traces.append((data, len(trace.execution_log)))
+
+    thread_traces = []
+    threads = [threading.Thread(target=traced_run, args=(data, thread_traces))
+               for data in (['A', 'B', 'C'], [1, 2, 3, 4])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print()
+    for data, steps in sorted(thread_traces, key=lambda item: len(item[0])):
+        print(f"Поток {data}: {steps} шагов в собственном контексте")
+
+    print("\n" + "="*60)
+    print("ПРИМЕР 10: КЭШ ПОДЗАДАЧ")
+    print("="*60)
+
+    cache = SubResultCache(max_bytes=1024 * 1024)
+    with TraceContext() as trace:
+        cached_combinations = generate_combinations(list(range(10)), 4, cache=cache)
+        print(f"\nC(10, 4) = {len(cached_combinations)}")
+        print(f"Статистика кэша: {cache.stats()}")
+        analyze_execution(trace)
+
     print("\n" + "="*60)
-    print("ВСЯ ИНФОРМАЦИЯ СОХРАНЕНА В КОЛЛЕКЦИЯХ:")
+    print("ВСЯ ИНФОРМАЦИЯ СОХРАНЕНА В ФАЙЛЕ ТРАССИРОВКИ (ПРИМЕР 8):")
     print("="*60)
-    print(f"Всего шагов вычислений: {len(execution_log)}")
-    print(f"Всего частичных результатов: {len(partial_results)}")
-    print(f"Всего итоговых результатов: {len(final_results)}")
+    print(f"Всего шагов вычислений: {exported['step']}")
+    print(f"Всего частичных результатов: {exported['partial']}")
+    print(f"Всего итоговых результатов: {exported['final']}")
@@ -0,0 +1,330 @@
+"""
+Замеры производительности обработки временных интервалов (лабораторная №4).
+
+Синтетический набор (CSV format,value) заданного размера, смеси форматов
+и доли ошибочных строк прогоняется по этапам:
+    parse     - разбор строк: factory (TimeIntervalFactory.create_interval
+                по строке) и batch (parse_batch по группам формата)
+    load      - потоковая загрузка файла IntervalFileLoader в коллекцию
+                (columnar - всегда, objects - до --max-object-size)
+    aggregate - команды sum/avg/max/min, агрегаты по форматам, медиана
+    filter    - фильтры по длительности и формату, пакет process_commands
+    format    - get_formatted/get_hms_format на выборке интервалов
+
+Для каждого замера: время, элементов в секунду и пиковая память
+(tracemalloc, только текущий процесс). С --instrument в отчет попадают
+и счетчики этапов TimeIntervalProcessor (instrument=True).
+
+Пример:
+    python benchmark.py --sizes 1000 100000 --mix hms=3,ms=1 --malformed 0.01 --output bench.json
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from main import (
+    FORMAT_CLASSES, TimeIntervalFactory, TimeIntervalCollection, ColumnarTimeIntervalCollection,
+    TimeIntervalProcessor, np
+)
+
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+MAX_SIZE = 50000000
+CHUNK_SIZE = 65536
+COMMANDS = ["sum", "avg", "max", "min"]
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """Смесь форматов вида 'hms=3,ms=1' -> доли по ключам FORMAT_CLASSES"""
+    mix = {}
+    for part in text.split(","):
+        key, _, weight = part.partition("=")
+        key = key.strip()
+        if key not in FORMAT_CLASSES:
+            raise argparse.ArgumentTypeError(f"неизвестный формат: {key}")
+        mix[key] = float(weight) if weight else 1.0
+    return mix
+
+def format_value(key: str, seconds: int) -> str:
+    """Строка длительности в синтаксисе формата"""
+    if key == "hms":
+        return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+    if key == "ms":
+        return str(seconds * 1000)
+    if key == "minsec":
+        return f"{seconds // 60} {seconds % 60}"
+    if key == "hours":
+        return f"{seconds / 3600:.4f}"
+    return str(seconds)
+
+def malformed_row(rng: random.Random) -> Tuple[str, str]:
+    """Ошибочная строка: неизвестный формат, мусор в значении или пустое значение"""
+    kind = rng.randrange(3)
+    if kind == 0:
+        return "days", "3"
+    key = rng.choice(list(FORMAT_CLASSES))
+    return key, ("n/a" if kind == 1 else "")
+
+def generate_rows(size: int, mix: Dict[str, float], malformed: float,
+                  seed: int) -> Iterator[List[Tuple[str, str]]]:
+    """Пачки строк (формат, значение); длительности до суток"""
+    rng = random.Random(seed)
+    keys, weights = list(mix), list(mix.values())
+    remaining = size
+    while remaining:
+        count = min(CHUNK_SIZE, remaining)
+        chosen = rng.choices(keys, weights, k=count)
+        rows = []
+        for key in chosen:
+            if malformed and rng.random() < malformed:
+                rows.append(malformed_row(rng))
+            else:
+                rows.append((key, format_value(key, rng.randrange(86400))))
+        yield rows
+        remaining -= count
+
+def write_dataset(path: str, size: int, mix: Dict[str, float], malformed: float, seed: int) -> None:
+    """Записывает набор в CSV с заголовком format,value"""
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["format", "value"])
+        for rows in generate_rows(size, mix, malformed, seed):
+            writer.writerows(rows)
+
+def read_rows(path: str) -> Iterator[List[List[str]]]:
+    """Пачки строк CSV без заголовка"""
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        reader = csv.reader(file)
+        next(reader)
+        while True:
+            rows = list(itertools.islice(reader, CHUNK_SIZE))
+            if not rows:
+                return
+            yield rows
+
+def measure(run: Callable[[], int], memory: bool,
+            processor: Optional[TimeIntervalProcessor] = None) -> Dict:
+    """
+    Один замер: время (без tracemalloc), затем при memory=True
+    повторный прогон под tracemalloc для пиковой памяти.
+    run возвращает число обработанных элементов. Счетчики этапов
+    processor учитывают только замер времени: на повторный прогон
+    они отключаются.
+    """
+    start = time.perf_counter()
+    items = run()
+    seconds = time.perf_counter() - start
+    record = {
+        "items": items,
+        "seconds": seconds,
+        "items_per_sec": items / seconds if seconds > 0 else None,
+        "peak_bytes": None
+    }
+    if memory:
+        counters = processor.counters if processor is not None else None
+        if processor is not None:
+            processor.counters = None
+        tracemalloc.start()
+        try:
+            run()
+            record["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+            if processor is not None:
+                processor.counters = counters
+    return record
+
+
+# ЭТАПЫ
+
+
+def parse_factory(path: str) -> int:
+    """Разбор по строке через фабрику (кэш разбора очищается)"""
+    if TimeIntervalFactory.parse_cache is not None:
+        TimeIntervalFactory.parse_cache.clear()
+    create = TimeIntervalFactory.create_interval
+    parsed = 0
+    for rows in read_rows(path):
+        for format_type, value in rows:
+            try:
+                create(format_type, value)
+                parsed += 1
+            except ValueError:
+                pass
+    return parsed
+
+def parse_batch(path: str) -> int:
+    """Разбор пачками: parse_batch по группам формата, при ошибке - построчно"""
+    parsed = 0
+    for rows in read_rows(path):
+        groups: Dict[str, List[str]] = {}
+        for format_type, value in rows:
+            groups.setdefault(format_type, []).append(value)
+        for format_type, values in groups.items():
+            cls = FORMAT_CLASSES.get(format_type)
+            if cls is None:
+                continue
+            try:
+                parsed += len(cls.parse_batch(values))
+            except ValueError:
+                parse = cls.__new__(cls)._parse_to_seconds
+                for value in values:
+                    try:
+                        parse(value)
+                        parsed += 1
+                    except ValueError:
+                        pass
+    return parsed
+
+def load(processor: TimeIntervalProcessor, path: str, factory: Callable[[], object]) -> int:
+    """Загрузка файла в новую коллекцию процессора (этап load его счетчиков)"""
+    processor.collection = factory()
+    return processor.load_intervals_from_file(path, "csv").loaded
+
+def aggregate(processor: TimeIntervalProcessor, repeats: int) -> int:
+    """Команды, агрегаты по форматам и медиана; число выполненных запросов"""
+    done = 0
+    for _ in range(repeats):
+        for command in COMMANDS:
+            processor.process_command(command)
+            for key in FORMAT_CLASSES:
+                processor.process_command(command, key)
+            done += 1 + len(FORMAT_CLASSES)
+    processor.collection.median()
+    return done + 1
+
+def filter_stage(processor: TimeIntervalProcessor) -> int:
+    """Фильтры коллекции и пакетный запрос с условиями; число отобранных интервалов"""
+    collection = processor.collection
+    threshold = collection.median()
+    found = len(collection.filter_by_min_seconds(threshold))
+    found += len(collection.filter_by_max_seconds(threshold))
+    for key in FORMAT_CLASSES:
+        found += len(collection.find_by_format(key))
+    queries = [{"command": command, "min_seconds": threshold} for command in COMMANDS]
+    queries += [{"command": command, "format": key, "max_seconds": threshold}
+                for command in COMMANDS for key in FORMAT_CLASSES]
+    processor.process_commands(queries)
+    return found
+
+def format_stage(collection, sample: int) -> int:
+    """Форматирование свежих объектов (кэши get_* еще пусты)"""
+    if isinstance(collection, ColumnarTimeIntervalCollection):
+        intervals = collection.iter_intervals()
+    else:
+        intervals = (type(interval)._from_parsed(interval.value, interval.get_seconds())
+                     for interval in collection.intervals)
+    formatted = 0
+    for interval in itertools.islice(intervals, sample):
+        interval.get_formatted()
+        interval.get_hms_format()
+        formatted += 1
+    return formatted
+
+
+def run_benchmarks(args, workdir: str) -> Tuple[List[Dict], List[Dict]]:
+    """Все замеры по размерам наборов, этапам и движкам; при --instrument
+    также итоги счетчиков TimeIntervalProcessor по каждой коллекции"""
+    records, counters = [], []
+
+    def add(stage: str, engine: str, size: int, run: Callable[[], int],
+            processor: Optional[TimeIntervalProcessor] = None):
+        record = {"stage": stage, "engine": engine, "size": size}
+        record.update(measure(run, not args.no_memory, processor))
+        records.append(record)
+        rate = record["items_per_sec"]
+        print(f"{stage:10s} {engine:8s} n={size:<9d} {record['seconds']:>9.3f} с "
+              f"{rate or 0:>14,.0f} эл/с", file=sys.stderr)
+
+    for size in args.sizes:
+        path = os.path.join(workdir, f"intervals_{size}.csv")
+        start = time.perf_counter()
+        write_dataset(path, size, args.mix, args.malformed, args.seed)
+        print(f"набор n={size}: {os.path.getsize(path)} байт за "
+              f"{time.perf_counter() - start:.1f} с", file=sys.stderr)
+
+        engines = [("columnar", lambda: ColumnarTimeIntervalCollection(keep_values=args.keep_values))]
+        if size <= args.max_object_size:
+            add("parse", "factory", size, lambda path=path: parse_factory(path))
+            engines.append(("objects", TimeIntervalCollection))
+        add("parse", "batch", size, lambda path=path: parse_batch(path))
+
+        for engine, factory in engines:
+            # Процессор создается до загрузки, чтобы счетчики видели и этап load
+            processor = TimeIntervalProcessor(instrument=args.instrument)
+            add("load", engine, size,
+                lambda processor=processor, path=path, factory=factory: load(processor, path, factory),
+                processor)
+            collection = processor.collection
+            add("aggregate", engine, size,
+                lambda processor=processor: aggregate(processor, args.repeats), processor)
+            add("filter", engine, size, lambda processor=processor: filter_stage(processor), processor)
+            add("format", engine, size,
+                lambda collection=collection: format_stage(collection, args.format_sample))
+            if args.instrument:
+                counters.append({"engine": engine, "size": size, "stages": processor.stage_report()})
+            del processor, collection  # освобождаем коллекцию до следующего движка
+        os.remove(path)
+    return records, counters
+
+def size_value(text: str) -> int:
+    size = int(float(text))
+    if not 1 <= size <= MAX_SIZE:
+        raise argparse.ArgumentTypeError(f"размер вне диапазона 1..{MAX_SIZE}")
+    return size
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры обработки временных интервалов")
+    parser.add_argument("--sizes", type=size_value, nargs="*", default=DEFAULT_SIZES,
+                        help="размеры наборов (до 5e7)")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(",".join(FORMAT_CLASSES)),
+                        help="смесь форматов, например hms=3,ms=1,seconds=1")
+    parser.add_argument("--malformed", type=float, default=0.0,
+                        help="доля ошибочных строк (0..1)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-object-size", type=int, default=1000000,
+                        help="наибольший набор для построчного разбора и коллекции объектов")
+    parser.add_argument("--keep-values", action="store_true",
+                        help="хранить исходные строки в колоночной коллекции")
+    parser.add_argument("--repeats", type=int, default=100,
+                        help="повторов команд на этапе aggregate")
+    parser.add_argument("--format-sample", type=int, default=100000,
+                        help="сколько интервалов форматировать")
+    parser.add_argument("--instrument", action="store_true",
+                        help="включить счетчики этапов процессора и добавить их в отчет")
+    parser.add_argument("--workdir", help="каталог для временных наборов")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="не замерять пиковую память (вдвое быстрее)")
+    parser.add_argument("--output", help="файл для результатов JSON (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        records, counters = run_benchmarks(args, workdir)
+    report = {
+        "python": sys.version.split()[0],
+        "numpy": np.__version__ if np is not None else None,
+        "mix": args.mix,
+        "malformed": args.malformed,
+        "results": records
+    }
+    if args.instrument:
+        report["counters"] = counters
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,9 +5,70 @@
 """
 
 from abc import ABC, abstractmethod
-from typing import List, Union, Dict, Any
-from datetime import timedelta
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Union, Dict, Any, Optional, Iterator, Type, Tuple, Iterable, TextIO, Callable
+from datetime import datetime, timedelta
+import csv
+import functools
+import io
+import itertools
+import json
 import math
+import mmap
+import os
+import stat
+import struct
+import sys
+import tempfile
+import time
+
+try:
+    import numpy as np
+except ImportError:  # NumPy необязателен: без него агрегаты считаются по array
+    np = None
+
+
+# ПАКЕТНЫЙ РАЗБОР ЧИСЛОВЫХ СТРОК
+
+
+def _as_array(typecode: str, column: Any) -> array:
+    """Копия непрерывного буфера (например, массива NumPy) в array без списка Python"""
+    result = array(typecode)
+    result.frombytes(memoryview(column).cast('B'))
+    return result
+
+
+def _float_column(values: List[str], scale: float = 1.0) -> array:
+    """
+    Переводит пачку числовых строк в array('d') одним вызовом на пачку:
+    np.array(dtype=float) при наличии NumPy, иначе array('d', map(float, ...)).
+    NumPy разбирает строки тем же float, поэтому ошибочная строка дает
+    тот же ValueError, что и построчный разбор.
+    
+    Args:
+        values: числовые строки
+        scale: множитель перевода в секунды
+        
+    Returns:
+        столбец длительностей в секундах
+    """
+    if np is not None:
+        column = np.array(values, dtype=np.float64)
+        if scale != 1.0:
+            column *= scale
+        return _as_array('d', column)
+    column = array('d', map(float, values))
+    if scale != 1.0:
+        column = array('d', [item * scale for item in column])
+    return column
+
+
+def _number_text(number: float) -> str:
+    """Число для восстановленного значения: целые без '.0' ("436", а не "436.0")"""
+    return str(int(number)) if number.is_integer() else repr(number)
 
 
 # БАЗОВЫЙ АБСТРАКТНЫЙ КЛАСС (ИНТЕРФЕЙС)
@@ -17,8 +78,14 @@ class TimeInterval(ABC):
     """
     Абстрактный базовый класс для временных интервалов.
     Определяет общий интерфейс для всех форматов временных интервалов.
+    
+    Объекты хранят поля в __slots__ (без __dict__), одинаковые строки
+    значений интернируются, а отформатированные строки вычисляются
+    при первом обращении и запоминаются.
     """
     
+    __slots__ = ('value', 'seconds', '_formatted', '_hms')
+    
     def __init__(self, value: str):
         """
         Инициализация интервала.
@@ -26,8 +93,74 @@ class TimeInterval(ABC):
         Args:
             value: строка, содержащая значение интервала в конкретном формате
         """
-        self.value = value
+        self.value = sys.intern(value) if type(value) is str else value
         self.seconds = self._parse_to_seconds(value)
+        self._formatted: Optional[str] = None
+        self._hms: Optional[str] = None
+    
+    @classmethod
+    def _from_parsed(cls, value: str, seconds: float) -> 'TimeInterval':
+        """
+        Создает интервал из уже известных значений без повторного парсинга.
+        Используется колоночной коллекцией при выдаче элементов.
+        
+        Args:
+            value: исходная строка интервала
+            seconds: длительность в секундах
+            
+        Returns:
+            объект интервала данного класса
+        """
+        interval = cls.__new__(cls)
+        interval.value = sys.intern(value) if type(value) is str else value
+        interval.seconds = seconds
+        interval._formatted = None
+        interval._hms = None
+        return interval
+    
+    @classmethod
+    def _value_from_seconds(cls, seconds: float) -> str:
+        """
+        Восстанавливает строковое значение в данном формате по секундам.
+        Нужен, когда коллекция не хранит исходные строки.
+        
+        Args:
+            seconds: длительность в секундах
+            
+        Returns:
+            строка в формате класса
+        """
+        return _number_text(seconds)
+    
+    @classmethod
+    def parse_seconds(cls, value: str) -> float:
+        """
+        Переводит строку в секунды без создания объекта интервала.
+        
+        Args:
+            value: строка в формате класса
+            
+        Returns:
+            длительность в секундах
+        """
+        return cls._parse_to_seconds(cls.__new__(cls), value)
+    
+    @classmethod
+    def parse_batch(cls, values: List[str]) -> List[float]:
+        """
+        Переводит пачку строк в секунды.
+        Классы с числовыми форматами переопределяют метод для
+        пакетного преобразования; при ошибке в любой строке
+        выбрасывается ValueError, и загрузчик разбирает пачку построчно.
+        
+        Args:
+            values: строки в формате класса
+            
+        Returns:
+            длительности в секундах (список или array('d'))
+        """
+        parse = cls.__new__(cls)._parse_to_seconds
+        return [parse(value) for value in values]
     
     @abstractmethod
     def _parse_to_seconds(self, value: str) -> float:
@@ -67,6 +200,9 @@ class TimeInterval(ABC):
         Returns:
             отформатированная строка
         """
+        if self._formatted is not None:
+            return self._formatted
+        
         total_seconds = int(self.seconds)
         
         hours = total_seconds // 3600
@@ -81,7 +217,8 @@ class TimeInterval(ABC):
         if seconds > 0 or not parts:
             parts.append(f"{seconds} s")
         
-        return " ".join(parts)
+        self._formatted = " ".join(parts)
+        return self._formatted
     
     def get_hms_format(self) -> str:
         """
@@ -90,13 +227,17 @@ class TimeInterval(ABC):
         Returns:
             строка в формате ЧЧ:ММ:СС
         """
+        if self._hms is not None:
+            return self._hms
+        
         total_seconds = int(self.seconds)
         
         hours = total_seconds // 3600
         minutes = (total_seconds % 3600) // 60
         seconds = total_seconds % 60
         
-        return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+        self._hms = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+        return self._hms
     
     def __str__(self) -> str:
         """
@@ -142,6 +283,8 @@ class TimeInterval(ABC):
 class HmsTimeInterval(TimeInterval):
     """Класс для интервала в формате часы:минуты:секунды (HH:MM:SS)"""
     
+    __slots__ = ()
+    
     def _parse_to_seconds(self, value: str) -> float:
         """
         Парсит строку формата "часы:минуты:секунды".
@@ -171,6 +314,17 @@ class HmsTimeInterval(TimeInterval):
         except ValueError as e:
             raise ValueError(f"Ошибка парсинга HMS формата '{value}': {e}")
     
+    @classmethod
+    def _value_from_seconds(cls, seconds: float) -> str:
+        total_seconds = int(seconds)
+        return f"{total_seconds // 3600:02d}:{total_seconds % 3600 // 60:02d}:{total_seconds % 60:02d}"
+    
+    @classmethod
+    def parse_batch(cls, values: List[str]) -> List[int]:
+        # Полная форма ЧЧ:ММ:СС; сокращенные формы уходят в построчный разбор
+        return [int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+                for hours, minutes, seconds in (value.split(":") for value in values)]
+    
     def get_format_name(self) -> str:
         return "Часы:минуты:секунды"
 
@@ -178,6 +332,8 @@ class HmsTimeInterval(TimeInterval):
 class MsTimeInterval(TimeInterval):
     """Класс для интервала в миллисекундах"""
     
+    __slots__ = ()
+    
     def _parse_to_seconds(self, value: str) -> float:
         """
         Парсит строку с миллисекундами.
@@ -195,6 +351,21 @@ class MsTimeInterval(TimeInterval):
         except ValueError as e:
             raise ValueError(f"Ошибка парсинга миллисекунд '{value}': {e}")
     
+    @classmethod
+    def _value_from_seconds(cls, seconds: float) -> str:
+        return str(round(seconds * 1000))
+    
+    @classmethod
+    def parse_batch(cls, values: List[str]) -> array:
+        if np is not None:
+            try:
+                milliseconds = np.array(values, dtype=np.int64)
+            except OverflowError:
+                pass  # вне int64: точный разбор через int ниже
+            else:
+                return _as_array('d', milliseconds / 1000.0)
+        return array('d', [milliseconds / 1000.0 for milliseconds in map(int, values)])
+    
     def get_format_name(self) -> str:
         return "Миллисекунды"
 
@@ -202,6 +373,8 @@ class MsTimeInterval(TimeInterval):
 class MinSecTimeInterval(TimeInterval):
     """Класс для интервала в формате минуты секунды (MM SS)"""
     
+    __slots__ = ()
+    
     def _parse_to_seconds(self, value: str) -> float:
         """
         Парсит строку формата "минуты секунды".
@@ -227,6 +400,17 @@ class MinSecTimeInterval(TimeInterval):
         except ValueError as e:
             raise ValueError(f"Ошибка парсинга минут и секунд '{value}': {e}")
     
+    @classmethod
+    def _value_from_seconds(cls, seconds: float) -> str:
+        minutes, rest = divmod(int(seconds), 60)
+        return f"{minutes} {rest}"
+    
+    @classmethod
+    def parse_batch(cls, values: List[str]) -> List[int]:
+        # Полная форма "ММ СС"; сокращенная форма уходит в построчный разбор
+        return [int(minutes) * 60 + int(seconds)
+                for minutes, seconds in (value.split() for value in values)]
+    
     def get_format_name(self) -> str:
         return "Минуты и секунды"
 
@@ -234,6 +418,8 @@ class MinSecTimeInterval(TimeInterval):
 class HoursTimeInterval(TimeInterval):
     """Класс для интервала в часах (десятичный формат)"""
     
+    __slots__ = ()
+    
     def _parse_to_seconds(self, value: str) -> float:
         """
         Парсит строку с часами в десятичном формате.
@@ -251,6 +437,14 @@ class HoursTimeInterval(TimeInterval):
         except ValueError as e:
             raise ValueError(f"Ошибка парсинга часов '{value}': {e}")
     
+    @classmethod
+    def _value_from_seconds(cls, seconds: float) -> str:
+        return _number_text(seconds / 3600)
+    
+    @classmethod
+    def parse_batch(cls, values: List[str]) -> array:
+        return _float_column(values, 3600)
+    
     def get_format_name(self) -> str:
         return "Часы (десятичные)"
 
@@ -258,6 +452,8 @@ class HoursTimeInterval(TimeInterval):
 class SecondsTimeInterval(TimeInterval):
     """Класс для интервала в секундах"""
     
+    __slots__ = ()
+    
     def _parse_to_seconds(self, value: str) -> float:
         """
         Парсит строку с секундами.
@@ -274,10 +470,104 @@ class SecondsTimeInterval(TimeInterval):
         except ValueError as e:
             raise ValueError(f"Ошибка парсинга секунд '{value}': {e}")
     
+    @classmethod
+    def parse_batch(cls, values: List[str]) -> array:
+        return _float_column(values)
+    
     def get_format_name(self) -> str:
         return "Секунды"
 
 
+# ТАБЛИЦА ФОРМАТОВ
+
+
+# Ключ формата -> класс; порядок задает однобайтовый код формата
+FORMAT_CLASSES: Dict[str, Type[TimeInterval]] = {
+    "hms": HmsTimeInterval,
+    "ms": MsTimeInterval,
+    "minsec": MinSecTimeInterval,
+    "hours": HoursTimeInterval,
+    "seconds": SecondsTimeInterval,
+}
+
+# Код формата (индекс) -> класс, и обратно
+CODE_CLASSES: List[Type[TimeInterval]] = list(FORMAT_CLASSES.values())
+FORMAT_CODES: Dict[Type[TimeInterval], int] = {cls: code for code, cls in enumerate(CODE_CLASSES)}
+
+# Название формата -> код (get_format_name не использует состояние объекта)
+FORMAT_NAME_CODES: Dict[str, int] = {
+    cls.__new__(cls).get_format_name(): code for code, cls in enumerate(CODE_CLASSES)
+}
+
+
+
+def _resolve_format_code(format_name: str) -> Optional[int]:
+    """Код формата по названию ("Секунды") или ключу ("seconds"); None, если формат неизвестен"""
+    code = FORMAT_NAME_CODES.get(format_name)
+    if code is None:
+        cls = FORMAT_CLASSES.get(format_name.lower().strip())
+        if cls is not None:
+            code = FORMAT_CODES[cls]
+    return code
+
+
+# КЭШ РАЗБОРА ЗНАЧЕНИЙ
+
+
+class ParseCache:
+    """
+    Ограниченный LRU-кэш разбора: (класс формата, строка) -> секунды.
+    Построен на functools.lru_cache, поэтому безопасен при одновременной
+    загрузке из нескольких потоков. Ошибочные значения не кэшируются.
+    """
+    
+    def __init__(self, max_size: int = 4096):
+        """
+        Args:
+            max_size: наибольшее число запоминаемых значений
+        """
+        self.max_size = max_size
+        self._parse = functools.lru_cache(maxsize=max_size)(self._parse_uncached)
+    
+    @staticmethod
+    def _parse_uncached(cls: Type[TimeInterval], value: str) -> float:
+        return cls.parse_seconds(value)
+    
+    def seconds(self, cls: Type[TimeInterval], value: str) -> float:
+        """
+        Длительность значения в секундах, из кэша или после разбора.
+        
+        Args:
+            cls: класс формата
+            value: строка в формате класса
+            
+        Returns:
+            длительность в секундах
+        """
+        return self._parse(cls, value)
+    
+    def clear(self) -> None:
+        """Очищает кэш и счетчики."""
+        self._parse.cache_clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Статистика кэша.
+        
+        Returns:
+            словарь с попаданиями, промахами, размером и долей попаданий
+        """
+        info = self._parse.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "max_size": info.maxsize,
+            "hit_rate": info.hits / lookups if lookups else 0.0
+        }
+
+
 # ФАБРИКА ДЛЯ СОЗДАНИЯ ОБЪЕКТОВ
 
 
@@ -285,8 +575,14 @@ class TimeIntervalFactory:
     """
     Фабрика для создания объектов временных интервалов
     на основе строкового описания формата и значения.
+    
+    Повторяющиеся значения не разбираются заново: секунды берутся
+    из общего кэша parse_cache (отключается configure_parse_cache(0)).
+    Каждый вызов по-прежнему возвращает новый объект.
     """
     
+    parse_cache: Optional[ParseCache] = ParseCache()
+    
     @staticmethod
     def create_interval(format_type: str, value: str) -> TimeInterval:
         """
@@ -299,252 +595,2650 @@ class TimeIntervalFactory:
         Returns:
             объект TimeInterval соответствующего класса
         """
-        format_type = format_type.lower().strip()
-        
-        if format_type == "hms":
-            return HmsTimeInterval(value)
-        elif format_type == "ms":
-            return MsTimeInterval(value)
-        elif format_type == "minsec":
-            return MinSecTimeInterval(value)
-        elif format_type == "hours":
-            return HoursTimeInterval(value)
-        elif format_type == "seconds":
-            return SecondsTimeInterval(value)
-        else:
-            raise ValueError(f"Неизвестный формат временного интервала: {format_type}")
+        cls = TimeIntervalFactory.resolve_class(format_type)
+        cache = TimeIntervalFactory.parse_cache
+        if cache is None or type(value) is not str:
+            return cls(value)
+        return cls._from_parsed(value, cache.seconds(cls, value))
+    
+    @staticmethod
+    def configure_parse_cache(max_size: int) -> Optional[ParseCache]:
+        """
+        Заменяет кэш разбора новым кэшем заданного размера.
+        
+        Args:
+            max_size: наибольшее число значений; 0 отключает кэш
+            
+        Returns:
+            новый кэш или None
+        """
+        TimeIntervalFactory.parse_cache = ParseCache(max_size) if max_size > 0 else None
+        return TimeIntervalFactory.parse_cache
+    
+    @staticmethod
+    def resolve_class(format_type: str) -> Type[TimeInterval]:
+        """
+        Находит класс интервала по типу формата через таблицу FORMAT_CLASSES.
+        Нормализация строки выполняется, только если точного совпадения нет.
+        
+        Args:
+            format_type: тип формата (hms, ms, minsec, hours, seconds)
+            
+        Returns:
+            класс TimeInterval для этого формата
+        """
+        cls = FORMAT_CLASSES.get(format_type)
+        if cls is None:
+            format_type = format_type.lower().strip()
+            cls = FORMAT_CLASSES.get(format_type)
+            if cls is None:
+                raise ValueError(f"Неизвестный формат временного интервала: {format_type}")
+        return cls
 
 
-# КОЛЛЕКЦИЯ ДЛЯ ХРАНЕНИЯ И ОБРАБОТКИ ИНТЕРВАЛОВ
+# НАКАПЛИВАЕМЫЕ АГРЕГАТЫ
 
 
-class TimeIntervalCollection:
+class RunningAggregates:
     """
-    Коллекция для хранения и обработки временных интервалов разных форматов.
-    Реализует общий интерфейс для работы с разнородными данными.
+    Агрегаты коллекции, обновляемые при каждом добавлении и удалении:
+    количество, сумма с компенсацией ошибки округления (алгоритм Кэхэна
+    в варианте Ноймайера), минимум и максимум вместе с элементом.
+    
+    При удалении текущего минимума или максимума экстремумы помечаются
+    устаревшими, и коллекция пересчитывает их при следующем запросе.
     """
     
     def __init__(self):
-        """Инициализация пустой коллекции."""
-        self.intervals: List[TimeInterval] = []
+        self.reset()
     
-    def add_interval(self, interval: TimeInterval) -> None:
+    def reset(self) -> None:
+        """Сбрасывает агрегаты к состоянию пустой коллекции."""
+        self.count = 0
+        self._total = 0.0
+        self._compensation = 0.0
+        self.min_seconds: Optional[float] = None
+        self.max_seconds: Optional[float] = None
+        self.min_item: Any = None
+        self.max_item: Any = None
+        self.stale = False
+    
+    def set_totals(self, count: int, total: float, compensation: float = 0.0) -> None:
         """
-        Добавляет интервал в коллекцию.
+        Заменяет количество и сумму посчитанными вне агрегатов
+        (векторно или из снимка); экстремумы задаются set_extremes.
         
         Args:
-            interval: объект временного интервала
+            count: количество элементов
+            total: сумма длительностей
+            compensation: накопленная поправка суммы (0 для точной суммы)
         """
-        self.intervals.append(interval)
+        self.count = count
+        self._total = total
+        self._compensation = compensation
     
-    def add_from_string(self, format_type: str, value: str) -> None:
+    def _accumulate(self, value: float) -> None:
+        """Добавляет слагаемое к сумме с компенсацией потерянных младших разрядов"""
+        total = self._total + value
+        if abs(self._total) >= abs(value):
+            self._compensation += (self._total - total) + value
+        else:
+            self._compensation += (value - total) + self._total
+        self._total = total
+    
+    @property
+    def total(self) -> float:
+        """Сумма длительностей в секундах"""
+        return self._total + self._compensation
+    
+    def add(self, seconds: float, item: Any) -> None:
         """
-        Создает и добавляет интервал на основе строкового описания.
+        Учитывает добавленный элемент.
         
         Args:
-            format_type: тип формата
-            value: значение интервала
+            seconds: длительность в секундах
+            item: элемент (интервал или его позиция), возвращаемый для min/max
         """
-        interval = TimeIntervalFactory.create_interval(format_type, value)
-        self.add_interval(interval)
-    
-    def clear(self) -> None:
-        """Очищает коллекцию."""
-        self.intervals.clear()
+        self.count += 1
+        self._accumulate(seconds)
+        if self.stale:
+            return
+        # Строгое сравнение: при равенстве остается первый элемент, как у max()/min()
+        if self.max_seconds is None or seconds > self.max_seconds:
+            self.max_seconds, self.max_item = seconds, item
+        if self.min_seconds is None or seconds < self.min_seconds:
+            self.min_seconds, self.min_item = seconds, item
     
-    def get_count(self) -> int:
+    def add_batch(self, seconds: List[float], items: Any) -> None:
         """
-        Возвращает количество интервалов в коллекции.
+        Учитывает пачку добавленных элементов за один проход встроенных функций.
         
-        Returns:
-            количество интервалов
+        Args:
+            seconds: длительности в секундах
+            items: последовательность элементов той же длины
         """
-        return len(self.intervals)
+        if not seconds:
+            return
+        self.count += len(seconds)
+        self._accumulate(math.fsum(seconds))
+        if self.stale:
+            return
+        largest = max(seconds)
+        if self.max_seconds is None or largest > self.max_seconds:
+            self.max_seconds, self.max_item = largest, items[seconds.index(largest)]
+        smallest = min(seconds)
+        if self.min_seconds is None or smallest < self.min_seconds:
+            self.min_seconds, self.min_item = smallest, items[seconds.index(smallest)]
     
-    def sum(self) -> Dict[str, Any]:
+    def remove(self, seconds: float) -> None:
         """
-        Вычисляет сумму всех интервалов в коллекции.
+        Учитывает удаление элемента.
         
-        Returns:
-            словарь с результатом в разных форматах
+        Args:
+            seconds: длительность удаленного элемента в секундах
         """
-        if not self.intervals:
-            return {"seconds": 0, "formatted": "0 s", "hms": "00:00:00"}
-        
-        total_seconds = sum(interval.get_seconds() for interval in self.intervals)
-        
-        # Создаем фиктивный интервал для форматирования
-        dummy = SecondsTimeInterval(str(total_seconds))
-        
-        return {
-            "seconds": total_seconds,
-            "formatted": dummy.get_formatted(),
-            "hms": dummy.get_hms_format()
-        }
+        self.count -= 1
+        if self.count == 0:
+            self.reset()
+            return
+        self._accumulate(-seconds)
+        if not self.stale and (seconds <= self.min_seconds or seconds >= self.max_seconds):
+            self.stale = True
     
-    def avg(self) -> Dict[str, Any]:
+    def set_extremes(self, min_seconds: float, min_item: Any,
+                     max_seconds: float, max_item: Any) -> None:
+        """Сохраняет пересчитанные коллекцией экстремумы."""
+        self.min_seconds, self.min_item = min_seconds, min_item
+        self.max_seconds, self.max_item = max_seconds, max_item
+        self.stale = False
+    
+    def merge(self, other: 'RunningAggregates') -> None:
         """
-        Вычисляет среднее значение интервалов в коллекции.
+        Добавляет агрегаты другой части данных (например, другого файла).
+        При равенстве экстремумов остается элемент текущих агрегатов.
         
-        Returns:
-            словарь со средним значением в разных форматах
+        Args:
+            other: агрегаты, объединяемые с текущими
         """
-        if not self.intervals:
-            return {"seconds": 0, "formatted": "0 s", "hms": "00:00:00"}
-        
-        total_seconds = sum(interval.get_seconds() for interval in self.intervals)
-        avg_seconds = total_seconds / len(self.intervals)
-        
-        # Создаем фиктивный интервал для форматирования
-        dummy = SecondsTimeInterval(str(avg_seconds))
+        if not other.count:
+            return
+        self.count += other.count
+        self._accumulate(other._total)
+        self._accumulate(other._compensation)
+        if self.stale or other.stale:
+            self.stale = True
+            return
+        if self.max_seconds is None or other.max_seconds > self.max_seconds:
+            self.max_seconds, self.max_item = other.max_seconds, other.max_item
+        if self.min_seconds is None or other.min_seconds < self.min_seconds:
+            self.min_seconds, self.min_item = other.min_seconds, other.min_item
+    
+    def shift_positions(self, removed: int) -> None:
+        """Сдвигает позиции-элементы min/max после удаления позиции removed."""
+        if self.stale or not self.count:
+            return
+        if self.min_item > removed:
+            self.min_item -= 1
+        if self.max_item > removed:
+            self.max_item -= 1
+
+
+def _aggregate_result(aggregates: RunningAggregates, command: str,
+                      resolve: Callable[[Any], TimeInterval]) -> Dict[str, Any]:
+    """
+    Словарь результата команды sum/avg/max/min по накопленным агрегатам.
+    
+    Args:
+        aggregates: агрегаты с актуальными экстремумами
+        command: sum, avg, max или min
+        resolve: превращает элемент min/max в интервал
         
+    Returns:
+        словарь в формате TimeIntervalCollection.sum()/max()
+    """
+    if command in ("sum", "avg"):
+        if not aggregates.count:
+            return {"seconds": 0, "formatted": "0 s", "hms": "00:00:00"}
+        seconds = aggregates.total if command == "sum" else aggregates.total / aggregates.count
+        dummy = SecondsTimeInterval._from_parsed(str(seconds), seconds)
         return {
-            "seconds": avg_seconds,
+            "seconds": seconds,
             "formatted": dummy.get_formatted(),
             "hms": dummy.get_hms_format()
         }
-    
-    def max(self) -> Dict[str, Any]:
-        """
-        Находит максимальный интервал в коллекции.
-        
-        Returns:
-            словарь с максимальным интервалом в разных форматах
-        """
-        if not self.intervals:
+    if command in ("max", "min"):
+        if not aggregates.count:
             return {"seconds": 0, "formatted": "0 s", "hms": "00:00:00", "original": None}
-        
-        max_interval = max(self.intervals)
-        
+        interval = resolve(aggregates.max_item if command == "max" else aggregates.min_item)
         return {
-            "seconds": max_interval.get_seconds(),
-            "formatted": max_interval.get_formatted(),
-            "hms": max_interval.get_hms_format(),
-            "original": str(max_interval)
+            "seconds": interval.get_seconds(),
+            "formatted": interval.get_formatted(),
+            "hms": interval.get_hms_format(),
+            "original": str(interval)
         }
+    raise ValueError(f"Неизвестная команда: {command}")
+
+
+# ОТСОРТИРОВАННЫЙ ИНДЕКС ПО СЕКУНДАМ
+
+
+class SortedSecondsIndex:
+    """
+    Отсортированный по длительности индекс коллекции: ключи в array('d')
+    и параллельная последовательность элементов - список интервалов или
+    позиции в столбцах (positional=True, array('q'): 16 байт на строку
+    вместе с ключами). Диапазоны и порядковые статистики ищутся бинарным
+    поиском за O(log n).
     
-    def min(self) -> Dict[str, Any]:
+    Одиночные добавления вставляются на место (bisect.insort), а после
+    пачечных изменений индекс помечается устаревшим (dirty) и коллекция
+    перестраивает его сортировкой при следующем запросе.
+    """
+    
+    def __init__(self, positional: bool = False):
+        self.positional = positional
+        self.reset()
+    
+    def __len__(self) -> int:
+        return len(self.keys)
+    
+    def reset(self) -> None:
+        """Очищает индекс."""
+        self.keys = array('d')
+        self.items: Any = array('q') if self.positional else []
+        self.dirty = False
+    
+    def build(self, keys: List[float], items: List[Any], order: Optional[Iterable[int]] = None) -> None:
         """
-        Находит минимальный интервал в коллекции.
+        Строит индекс заново.
         
-        Returns:
-            словарь с минимальным интервалом в разных форматах
+        Args:
+            keys: длительности в секундах
+            items: элементы в том же порядке
+            order: готовая устойчивая сортирующая перестановка (например, из NumPy)
         """
-        if not self.intervals:
-            return {"seconds": 0, "formatted": "0 s", "hms": "00:00:00", "original": None}
-        
-        min_interval = min(self.intervals)
-        
-        return {
-            "seconds": min_interval.get_seconds(),
-            "formatted": min_interval.get_formatted(),
-            "hms": min_interval.get_hms_format(),
-            "original": str(min_interval)
-        }
+        if order is None:
+            order = sorted(range(len(keys)), key=keys.__getitem__)
+        order = list(order)
+        self.keys = array('d', [keys[i] for i in order])
+        self.items = [items[i] for i in order]
+        self.dirty = False
     
-    def filter_by_min_seconds(self, min_seconds: float) -> List[TimeInterval]:
+    def build_positions(self, sorted_keys: Any, order: Any) -> None:
         """
-        Фильтрует интервалы по минимальной длительности.
+        Строит позиционный индекс из готовой сортировки без списков Python.
         
         Args:
-            min_seconds: минимальная длительность в секундах
-            
-        Returns:
-            список интервалов, длительность которых >= min_seconds
+            sorted_keys: длительности по возрастанию (буфер float64, например NumPy)
+            order: позиции строк в том же порядке (буфер int64)
         """
-        return [interval for interval in self.intervals if interval.get_seconds() >= min_seconds]
+        self.keys = array('d')
+        self.keys.frombytes(memoryview(sorted_keys).cast('B'))
+        self.items = array('q')
+        self.items.frombytes(memoryview(order).cast('B'))
+        self.dirty = False
     
-    def filter_by_max_seconds(self, max_seconds: float) -> List[TimeInterval]:
+    def insert(self, seconds: float, item: Any) -> None:
+        """Вставляет элемент после всех равных ему по длительности."""
+        position = bisect_right(self.keys, seconds)
+        self.keys.insert(position, seconds)
+        self.items.insert(position, item)
+    
+    def remove(self, seconds: float, item: Any) -> None:
+        """Удаляет именно этот элемент среди равных ему по длительности."""
+        for position in range(bisect_left(self.keys, seconds), bisect_right(self.keys, seconds)):
+            if self.items[position] is item:
+                del self.keys[position]
+                del self.items[position]
+                return
+        raise ValueError(f"Элемент не найден в индексе: {item!r}")
+    
+    def bounds(self, min_seconds: Optional[float] = None,
+               max_seconds: Optional[float] = None) -> Tuple[int, int]:
         """
-        Фильтрует интервалы по максимальной длительности.
+        Границы диапазона min_seconds <= секунды <= max_seconds в индексе.
         
-        Args:
-            max_seconds: максимальная длительность в секундах
-            
         Returns:
-            список интервалов, длительность которых <= max_seconds
+            пара (начало, конец) для среза keys/items
         """
-        return [interval for interval in self.intervals if interval.get_seconds() <= max_seconds]
+        low = 0 if min_seconds is None else bisect_left(self.keys, min_seconds)
+        high = len(self.keys) if max_seconds is None else bisect_right(self.keys, max_seconds)
+        return low, max(low, high)
     
-    def find_by_format(self, format_name: str) -> List[TimeInterval]:
+    def percentile(self, percent: float) -> float:
         """
-        Находит все интервалы заданного формата.
+        Процентиль длительности с линейной интерполяцией между соседними рангами.
         
         Args:
-            format_name: название формата для поиска
+            percent: процент от 0 до 100
             
         Returns:
-            список интервалов заданного формата
+            значение процентиля в секундах
         """
-        return [interval for interval in self.intervals if interval.get_format_name() == format_name]
+        if not self.keys:
+            raise ValueError("Процентиль пустой коллекции не определен")
+        if not 0 <= percent <= 100:
+            raise ValueError(f"Процент должен быть от 0 до 100: {percent}")
+        rank = percent / 100 * (len(self.keys) - 1)
+        lower = int(rank)
+        if lower + 1 >= len(self.keys):
+            return self.keys[lower]
+        fraction = rank - lower
+        return self.keys[lower] + (self.keys[lower + 1] - self.keys[lower]) * fraction
+
+
+class IntervalSlice:
+    """
+    Ленивое представление диапазона отсортированного индекса.
+    Интервалы создаются только при обращении; представление действительно
+    до следующего изменения коллекции.
+    """
     
-    def print_all(self) -> None:
-        """Выводит информацию о всех интервалах в коллекции."""
-        print(f"\nКоллекция содержит {self.get_count()} интервалов:")
-        print("-" * 60)
-        for i, interval in enumerate(self.intervals, 1):
-            print(f"{i:3d}. {interval}")
-        print("-" * 60)
+    def __init__(self, index: SortedSecondsIndex, start: int, stop: int,
+                 resolve: Callable[[Any], TimeInterval]):
+        self._index = index
+        self._start = start
+        self._stop = stop
+        self._resolve = resolve
+    
+    def __len__(self) -> int:
+        return self._stop - self._start
+    
+    def __iter__(self) -> Iterator[TimeInterval]:
+        items = self._index.items
+        for position in range(self._start, self._stop):
+            yield self._resolve(items[position])
+    
+    def __getitem__(self, position: int) -> TimeInterval:
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("Позиция вне диапазона")
+        return self._resolve(self._index.items[self._start + position])
+    
+    def seconds(self) -> array:
+        """Длительности диапазона в порядке возрастания (копия столбца)"""
+        return self._index.keys[self._start:self._stop]
 
 
-# КЛАСС ДЛЯ ОБРАБОТКИ ВВОДА/ВЫВОДА
+# ИНДЕКС ПО ФОРМАТАМ
 
 
-class TimeIntervalProcessor:
+class FormatIndex:
     """
-    Класс для обработки ввода/вывода и взаимодействия с пользователем.
+    Вторичный индекс по формату: код формата -> элементы этого формата
+    в порядке добавления и их накапливаемые агрегаты. Поиск по формату
+    стоит O(k) от числа найденных, агрегаты формата берутся за O(1).
+    
+    Элементы - интервалы (members - списки) или позиции в столбцах
+    (positional=True, members - array('q')).
     """
     
-    def __init__(self):
-        """Инициализация процессора с пустой коллекцией."""
-        self.collection = TimeIntervalCollection()
+    def __init__(self, positional: bool = False):
+        self.positional = positional
+        self.reset()
     
-    def load_intervals_from_list(self, intervals_list: List[Dict[str, str]]) -> None:
+    def reset(self) -> None:
+        """Очищает индекс."""
+        self.members: Dict[int, Any] = {}
+        self.aggregates: Dict[int, RunningAggregates] = {}
+        self.dirty = False
+    
+    def _bucket(self, code: int) -> Tuple[Any, RunningAggregates]:
+        members = self.members.get(code)
+        if members is None:
+            members = self.members[code] = array('q') if self.positional else []
+            self.aggregates[code] = RunningAggregates()
+        return members, self.aggregates[code]
+    
+    def add(self, code: int, seconds: float, item: Any) -> None:
+        """Учитывает добавленный элемент."""
+        members, aggregates = self._bucket(code)
+        members.append(item)
+        aggregates.add(seconds, item)
+    
+    def add_group(self, code: int, seconds: List[float], items: List[Any]) -> None:
+        """Учитывает пачку добавленных элементов одного формата."""
+        members, aggregates = self._bucket(code)
+        members.extend(items)
+        aggregates.add_batch(seconds, items)
+    
+    def set_group(self, code: int, positions: Any, aggregates: RunningAggregates) -> None:
         """
-        Загружает интервалы из списка словарей.
+        Задает позиции формата заново (при перестройке позиционного индекса).
         
         Args:
-            intervals_list: список словарей вида {'format': 'hms', 'value': '01:30:00'}
+            code: код формата
+            positions: позиции по возрастанию (буфер int64, например NumPy)
+            aggregates: готовые агрегаты этих позиций
         """
-        for interval_data in intervals_list:
+        members = array('q')
+        members.frombytes(memoryview(positions).cast('B'))
+        self.members[code] = members
+        self.aggregates[code] = aggregates
+    
+    def add_batch(self, codes: List[int], seconds: List[float], items: Any) -> None:
+        """Учитывает пачку добавленных элементов, по одному проходу на формат."""
+        distinct = set(codes)
+        if len(distinct) == 1:
+            self.add_group(codes[0], list(seconds), list(items))
+            return
+        for code in distinct:
+            picked = [i for i, item in enumerate(codes) if item == code]
+            self.add_group(code, [seconds[i] for i in picked], [items[i] for i in picked])
+    
+    def remove(self, code: int, seconds: float, item: Any) -> None:
+        """Удаляет именно этот элемент (используется для списков интервалов)."""
+        members = self.members[code]
+        for position, member in enumerate(members):
+            if member is item:
+                del members[position]
+                break
+        self.aggregates[code].remove(seconds)
+
+
+# КОЛЛЕКЦИЯ ДЛЯ ХРАНЕНИЯ И ОБРАБОТКИ ИНТЕРВАЛОВ
+
+
+class _IntervalQueriesMixin:
+    """
+    Общие запросы коллекций интервалов: команды sum/avg/max/min по
+    поддерживаемым агрегатам и запросы к отсортированному индексу и
+    индексу по форматам.
+    
+    Коллекция предоставляет self.aggregates и методы _extremes(), _sorted(),
+    _formats(), resolve_item(item) (элемент индекса -> интервал) и
+    _item_seconds(item) (элемент индекса -> длительность).
+    """
+    
+    def _command_result(self, command: str) -> Dict[str, Any]:
+        """Результат команды по агрегатам всей коллекции"""
+        aggregates = self.aggregates
+        if command in ("max", "min") and aggregates.count:
+            aggregates = self._extremes()
+        return _aggregate_result(aggregates, command, self.resolve_item)
+    
+    def sum(self) -> Dict[str, Any]:
+        """
+        Вычисляет сумму всех интервалов в коллекции.
+        
+        Returns:
+            словарь с результатом в разных форматах
+        """
+        return self._command_result("sum")
+    
+    def avg(self) -> Dict[str, Any]:
+        """
+        Вычисляет среднее значение интервалов в коллекции.
+        
+        Returns:
+            словарь со средним значением в разных форматах
+        """
+        return self._command_result("avg")
+    
+    def max(self) -> Dict[str, Any]:
+        """
+        Находит максимальный интервал в коллекции.
+        
+        Returns:
+            словарь с максимальным интервалом в разных форматах
+        """
+        return self._command_result("max")
+    
+    def min(self) -> Dict[str, Any]:
+        """
+        Находит минимальный интервал в коллекции.
+        
+        Returns:
+            словарь с минимальным интервалом в разных форматах
+        """
+        return self._command_result("min")
+    
+    def range_by_seconds(self, min_seconds: Optional[float] = None,
+                         max_seconds: Optional[float] = None) -> IntervalSlice:
+        """
+        Интервалы с длительностью в диапазоне [min_seconds, max_seconds]
+        в порядке возрастания, без просмотра всей коллекции.
+        
+        Args:
+            min_seconds: нижняя граница (None - без ограничения)
+            max_seconds: верхняя граница (None - без ограничения)
+            
+        Returns:
+            ленивое представление диапазона
+        """
+        index = self._sorted()
+        start, stop = index.bounds(min_seconds, max_seconds)
+        return IntervalSlice(index, start, stop, self.resolve_item)
+    
+    def count_in_range(self, min_seconds: Optional[float] = None,
+                       max_seconds: Optional[float] = None) -> int:
+        """
+        Количество интервалов с длительностью в диапазоне [min_seconds, max_seconds].
+        
+        Returns:
+            количество интервалов
+        """
+        start, stop = self._sorted().bounds(min_seconds, max_seconds)
+        return stop - start
+    
+    def kth_smallest(self, k: int) -> TimeInterval:
+        """
+        Возвращает k-й по возрастанию длительности интервал (с нуля).
+        
+        Args:
+            k: порядковый номер
+            
+        Returns:
+            интервал
+        """
+        index = self._sorted()
+        if not 0 <= k < len(index):
+            raise ValueError(f"Порядковый номер вне коллекции: {k}")
+        return self.resolve_item(index.items[k])
+    
+    def percentile(self, percent: float) -> float:
+        """
+        Процентиль длительности интервалов в секундах.
+        
+        Args:
+            percent: процент от 0 до 100
+            
+        Returns:
+            значение процентиля в секундах
+        """
+        return self._sorted().percentile(percent)
+    
+    def median(self) -> float:
+        """
+        Медиана длительности интервалов в секундах.
+        
+        Returns:
+            медиана в секундах
+        """
+        return self.percentile(50)
+    
+    def aggregate_by_format(self, format_name: str, command: str) -> Dict[str, Any]:
+        """
+        Вычисляет sum/avg/max/min только по интервалам одного формата,
+        не просматривая интервалы других форматов.
+        
+        Args:
+            format_name: название ("Секунды") или ключ ("seconds") формата
+            command: sum, avg, max или min
+            
+        Returns:
+            словарь с результатом в разных форматах
+        """
+        code = _resolve_format_code(format_name)
+        if code is None:
+            raise ValueError(f"Неизвестный формат временного интервала: {format_name}")
+        index = self._formats()
+        aggregates = index.aggregates.get(code) or RunningAggregates()
+        if aggregates.stale:
+            members = index.members[code]
+            max_item = max(members, key=self._item_seconds)
+            min_item = min(members, key=self._item_seconds)
+            aggregates.set_extremes(self._item_seconds(min_item), min_item,
+                                    self._item_seconds(max_item), max_item)
+        return _aggregate_result(aggregates, command, self.resolve_item)
+
+
+class TimeIntervalCollection(_IntervalQueriesMixin):
+    """
+    Коллекция для хранения и обработки временных интервалов разных форматов.
+    Реализует общий интерфейс для работы с разнородными данными.
+    """
+    
+    def __init__(self):
+        """Инициализация пустой коллекции."""
+        self.intervals: List[TimeInterval] = []
+        self.aggregates = RunningAggregates()
+        self._sorted_index: Optional[SortedSecondsIndex] = None  # строится при первом запросе
+        self._format_index: Optional[FormatIndex] = None  # строится при первом поиске по формату
+    
+    def add_interval(self, interval: TimeInterval) -> None:
+        """
+        Добавляет интервал в коллекцию.
+        
+        Args:
+            interval: объект временного интервала
+        """
+        self.intervals.append(interval)
+        self.aggregates.add(interval.get_seconds(), interval)
+        if self._sorted_index is not None and not self._sorted_index.dirty:
+            self._sorted_index.insert(interval.get_seconds(), interval)
+        if self._format_index is not None:
+            self._format_index.add(FORMAT_CODES[type(interval)], interval.get_seconds(), interval)
+    
+    def add_from_string(self, format_type: str, value: str) -> None:
+        """
+        Создает и добавляет интервал на основе строкового описания.
+        
+        Args:
+            format_type: тип формата
+            value: значение интервала
+        """
+        interval = TimeIntervalFactory.create_interval(format_type, value)
+        self.add_interval(interval)
+    
+    def extend_parsed(self, codes: List[int], seconds: List[float], values: List[str]) -> None:
+        """
+        Добавляет пачку уже разобранных интервалов (используется загрузчиком).
+        
+        Args:
+            codes: коды форматов (индексы в CODE_CLASSES)
+            seconds: длительности в секундах
+            values: исходные строки
+        """
+        added = [
+            CODE_CLASSES[code]._from_parsed(value, item)
+            for code, item, value in zip(codes, seconds, values)
+        ]
+        self.intervals.extend(added)
+        self.aggregates.add_batch(list(seconds), added)
+        if self._sorted_index is not None and added:
+            self._sorted_index.dirty = True
+        if self._format_index is not None:
+            self._format_index.add_batch(codes, seconds, added)
+    
+    def remove_interval(self, interval: TimeInterval) -> None:
+        """
+        Удаляет из коллекции именно этот объект интервала.
+        
+        Args:
+            interval: объект, ранее добавленный в коллекцию
+        """
+        for index, item in enumerate(self.intervals):
+            if item is interval:
+                self.pop(index)
+                return
+        raise ValueError(f"Интервал не найден в коллекции: {interval!r}")
+    
+    def pop(self, index: int = -1) -> TimeInterval:
+        """
+        Удаляет и возвращает интервал по позиции.
+        
+        Args:
+            index: позиция интервала (по умолчанию последний)
+            
+        Returns:
+            удаленный интервал
+        """
+        interval = self.intervals.pop(index)
+        self.aggregates.remove(interval.get_seconds())
+        if self._sorted_index is not None and not self._sorted_index.dirty:
+            self._sorted_index.remove(interval.get_seconds(), interval)
+        if self._format_index is not None:
+            self._format_index.remove(FORMAT_CODES[type(interval)], interval.get_seconds(), interval)
+        return interval
+    
+    def clear(self) -> None:
+        """Очищает коллекцию."""
+        self.intervals.clear()
+        self.aggregates.reset()
+        if self._sorted_index is not None:
+            self._sorted_index.reset()
+        if self._format_index is not None:
+            self._format_index.reset()
+    
+    def _extremes(self) -> RunningAggregates:
+        """Агрегаты с актуальными минимумом и максимумом"""
+        if self.aggregates.stale:
+            max_interval = max(self.intervals)
+            min_interval = min(self.intervals)
+            self.aggregates.set_extremes(min_interval.get_seconds(), min_interval,
+                                         max_interval.get_seconds(), max_interval)
+        return self.aggregates
+    
+    def get_count(self) -> int:
+        """
+        Возвращает количество интервалов в коллекции.
+        
+        Returns:
+            количество интервалов
+        """
+        return len(self.intervals)
+    
+    def _sorted(self) -> SortedSecondsIndex:
+        """Отсортированный индекс, построенный или перестроенный при необходимости"""
+        if self._sorted_index is None:
+            self._sorted_index = SortedSecondsIndex()
+            self._sorted_index.dirty = True
+        if self._sorted_index.dirty:
+            self._sorted_index.build([interval.get_seconds() for interval in self.intervals],
+                                     self.intervals)
+        return self._sorted_index
+    
+    def filter_by_min_seconds(self, min_seconds: float) -> List[TimeInterval]:
+        """
+        Фильтрует интервалы по минимальной длительности.
+        
+        Args:
+            min_seconds: минимальная длительность в секундах
+            
+        Returns:
+            список интервалов, длительность которых >= min_seconds
+        """
+        return [interval for interval in self.intervals if interval.get_seconds() >= min_seconds]
+    
+    def filter_by_max_seconds(self, max_seconds: float) -> List[TimeInterval]:
+        """
+        Фильтрует интервалы по максимальной длительности.
+        
+        Args:
+            max_seconds: максимальная длительность в секундах
+            
+        Returns:
+            список интервалов, длительность которых <= max_seconds
+        """
+        return [interval for interval in self.intervals if interval.get_seconds() <= max_seconds]
+    
+    def find_by_format(self, format_name: str) -> List[TimeInterval]:
+        """
+        Находит все интервалы заданного формата.
+        
+        Args:
+            format_name: название формата для поиска
+            
+        Returns:
+            список интервалов заданного формата
+        """
+        code = _resolve_format_code(format_name)
+        if code is None:
+            return []
+        return list(self._formats().members.get(code, []))
+    
+    def _formats(self) -> FormatIndex:
+        """Индекс по форматам, построенный при первом обращении"""
+        if self._format_index is None:
+            self._format_index = FormatIndex()
+            self._format_index.add_batch([FORMAT_CODES[type(interval)] for interval in self.intervals],
+                                         [interval.get_seconds() for interval in self.intervals],
+                                         self.intervals)
+        return self._format_index
+    
+    def resolve_item(self, item: TimeInterval) -> TimeInterval:
+        """Интервал по элементу агрегатов (здесь элементы - сами интервалы)"""
+        return item
+    
+    @staticmethod
+    def _item_seconds(item: TimeInterval) -> float:
+        return item.get_seconds()
+    
+    def query_aggregates(self, selectors: List['QuerySelector']) -> List[RunningAggregates]:
+        """
+        Считает агрегаты для нескольких выборок за один проход по коллекции.
+        
+        Args:
+            selectors: условия отбора интервалов
+            
+        Returns:
+            агрегаты каждой выборки (элементы min/max - интервалы)
+        """
+        groups = [(selector, RunningAggregates()) for selector in selectors]
+        for interval in self.intervals:
+            seconds = interval.get_seconds()
+            code = FORMAT_CODES[type(interval)]
+            for selector, aggregates in groups:
+                if selector.matches(seconds, code, interval):
+                    aggregates.add(seconds, interval)
+        return [aggregates for _, aggregates in groups]
+    
+    def save_snapshot(self, path: str, keep_values: bool = True) -> None:
+        """
+        Сохраняет коллекцию в двоичный снимок (см. ColumnarTimeIntervalCollection.save_snapshot).
+        Снимок открывается как ColumnarTimeIntervalCollection.load_snapshot.
+        
+        Args:
+            path: путь к файлу снимка
+            keep_values: сохранять исходные строки
+        """
+        columnar = ColumnarTimeIntervalCollection(keep_values)
+        columnar.extend_parsed([FORMAT_CODES[type(interval)] for interval in self.intervals],
+                               [interval.get_seconds() for interval in self.intervals],
+                               [interval.value for interval in self.intervals])
+        columnar.save_snapshot(path)
+    
+    def print_all(self) -> None:
+        """Выводит информацию о всех интервалах в коллекции."""
+        print(f"\nКоллекция содержит {self.get_count()} интервалов:")
+        print("-" * 60)
+        for i, interval in enumerate(self.intervals, 1):
+            print(f"{i:3d}. {interval}")
+        print("-" * 60)
+
+
+# ДВОИЧНЫЙ СНИМОК КОЛЛЕКЦИИ
+
+
+# Заголовок снимка: сигнатура, версия, флаги, количество, размер кучи строк,
+# сумма и ее компенсация, минимум, максимум и их позиции (little-endian, 80 байт)
+SNAPSHOT_MAGIC = b'TIVSNAP1'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HAS_VALUES = 1
+_SNAPSHOT_HEADER = struct.Struct('<8sIIQQddddqq')
+
+
+def _align8(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+class _SnapshotStrings:
+    """
+    Столбец исходных строк снимка: смещения в куче UTF-8 внутри mmap.
+    Строка декодируется только при обращении; пустая строка означает,
+    что значение не сохранялось.
+    """
+    
+    __slots__ = ('offsets', 'heap')
+    
+    def __init__(self, offsets: memoryview, heap: memoryview):
+        self.offsets = offsets
+        self.heap = heap
+    
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+    
+    def __getitem__(self, index: int) -> Optional[str]:
+        start, stop = self.offsets[index], self.offsets[index + 1]
+        if start == stop:
+            return None
+        return sys.intern(str(self.heap[start:stop], 'utf-8'))
+    
+    def __iter__(self) -> Iterator[Optional[str]]:
+        for index in range(len(self)):
+            yield self[index]
+
+
+def _new_file_mode(path: str) -> int:
+    """Права, с которыми open(path, 'wb') оставил бы файл: права существующего файла или 0o666 без umask"""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def _little_endian(column: Any, typecode: str) -> bytes:
+    """Байты столбца в порядке little-endian"""
+    if sys.byteorder == 'little':
+        return column.tobytes()
+    swapped = array(typecode, column)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+# КОЛОНОЧНАЯ КОЛЛЕКЦИЯ ИНТЕРВАЛОВ
+
+
+class ColumnarTimeIntervalCollection(_IntervalQueriesMixin):
+    """
+    Коллекция интервалов, хранящая данные по столбцам:
+    секунды в array('d'), код формата в array('B') и, по желанию,
+    исходные строки. Объекты TimeInterval создаются только при выдаче.
+    
+    Интерфейс совпадает с TimeIntervalCollection. Агрегаты и фильтры
+    выполняются векторно через NumPy (представление того же буфера
+    без копирования), а без NumPy - встроенными функциями по массиву.
+    
+    Без строк один интервал занимает 9 байт: 50 млн интервалов - около 450 МБ.
+    Поэтому по умолчанию строки не хранятся, а значение выданного интервала
+    восстанавливается по секундам в каноническом виде формата ("01:00:00"
+    вместо "1:0:0"). keep_values=True сохраняет исходное написание ценой
+    указателя и строки на интервал - сотни мегабайт на десятки миллионов.
+    """
+    
+    def __init__(self, keep_values: bool = False):
+        """
+        Инициализация пустой коллекции.
+        
+        Args:
+            keep_values: хранить исходные строки; по умолчанию строка
+                восстанавливается по секундам при выдаче интервала
+        """
+        self.keep_values = keep_values
+        self.seconds = array('d')
+        self.codes = array('B')
+        self.values: Optional[List[str]] = None  # создается при первом добавлении
+        self.aggregates = RunningAggregates()  # элементы min/max - позиции в столбцах
+        self._sorted_index: Optional[SortedSecondsIndex] = None  # элементы - позиции
+        self._format_index: Optional[FormatIndex] = None  # элементы - позиции
+        self._snapshot: Optional[mmap.mmap] = None  # отображенный снимок, пока столбцы не изменены
+    
+    def add_interval(self, interval: TimeInterval) -> None:
+        """
+        Добавляет интервал в коллекцию.
+        
+        Args:
+            interval: объект временного интервала
+        """
+        self.add_parsed(FORMAT_CODES[type(interval)], interval.get_seconds(), interval.value)
+    
+    def add_parsed(self, code: int, seconds: float, value: Optional[str] = None) -> None:
+        """
+        Добавляет уже разобранный интервал без создания объекта.
+        
+        Args:
+            code: код формата (индекс в CODE_CLASSES)
+            seconds: длительность в секундах
+            value: исходная строка (сохраняется при keep_values)
+        """
+        if self._snapshot is not None:
+            self._detach_snapshot()
+        self.aggregates.add(seconds, len(self.seconds))
+        if self._sorted_index is not None and not self._sorted_index.dirty:
+            self._sorted_index.insert(seconds, len(self.seconds))
+        if self._format_index is not None and not self._format_index.dirty:
+            self._format_index.add(code, seconds, len(self.seconds))
+        self.seconds.append(seconds)
+        self.codes.append(code)
+        if self.keep_values:
+            if self.values is None:
+                self.values = []
+            self.values.append(sys.intern(value) if type(value) is str else value)
+    
+    def add_from_string(self, format_type: str, value: str) -> None:
+        """
+        Создает и добавляет интервал на основе строкового описания.
+        
+        Args:
+            format_type: тип формата
+            value: значение интервала
+        """
+        interval = TimeIntervalFactory.create_interval(format_type, value)
+        self.add_interval(interval)
+    
+    def extend_parsed(self, codes: List[int], seconds: List[float], values: List[str]) -> None:
+        """
+        Добавляет пачку уже разобранных интервалов одним расширением столбцов.
+        
+        Args:
+            codes: коды форматов (индексы в CODE_CLASSES)
+            seconds: длительности в секундах
+            values: исходные строки (сохраняются при keep_values)
+        """
+        if self._snapshot is not None:
+            self._detach_snapshot()
+        start = len(self.seconds)
+        self.seconds.extend(seconds)
+        self.codes.extend(codes)
+        if self.keep_values:
+            if self.values is None:
+                self.values = []
+            self.values.extend(map(sys.intern, values))
+        self.aggregates.add_batch(self.seconds[start:], range(start, len(self.seconds)))
+        if self._sorted_index is not None and len(self.seconds) > start:
+            self._sorted_index.dirty = True
+        if self._format_index is not None and not self._format_index.dirty:
+            self._format_index.add_batch(codes, self.seconds[start:], range(start, len(self.seconds)))
+    
+    def pop(self, index: int = -1) -> TimeInterval:
+        """
+        Удаляет и возвращает интервал по позиции.
+        
+        Args:
+            index: позиция интервала (по умолчанию последний)
+            
+        Returns:
+            удаленный интервал
+        """
+        if self._snapshot is not None:
+            self._detach_snapshot()
+        if index < 0:
+            index += len(self.seconds)
+        interval = self.interval_at(index)
+        del self.seconds[index]
+        del self.codes[index]
+        if self.values is not None:
+            del self.values[index]
+        self.aggregates.remove(interval.get_seconds())
+        # Позиции после удаленной сдвигаются на одну влево
+        self.aggregates.shift_positions(index)
+        # Позиции в индексах тоже сдвинулись: перестроим при следующем запросе
+        if self._sorted_index is not None:
+            self._sorted_index.dirty = True
+        if self._format_index is not None:
+            self._format_index.dirty = True
+        return interval
+    
+    def clear(self) -> None:
+        """Очищает коллекцию."""
+        self.close()
+        self.seconds = array('d')
+        self.codes = array('B')
+        self.values = None
+        self.aggregates.reset()
+        if self._sorted_index is not None:
+            self._sorted_index.reset()
+        if self._format_index is not None:
+            self._format_index.reset()
+    
+    def get_count(self) -> int:
+        """
+        Возвращает количество интервалов в коллекции.
+        
+        Returns:
+            количество интервалов
+        """
+        return len(self.seconds)
+    
+    def save_snapshot(self, path: str) -> None:
+        """
+        Сохраняет коллекцию в компактный двоичный снимок: заголовок с
+        количеством и агрегатами, столбец секунд float64, столбец кодов
+        форматов uint8 и, если строки хранятся, смещения uint64 в куче UTF-8.
+        
+        Args:
+            path: путь к файлу снимка
+        """
+        count = len(self.seconds)
+        aggregates = self._extremes()
+        has_values = self.values is not None
+        heap = bytearray()
+        offsets = array('Q', [0])
+        if has_values:
+            for value in self.values:
+                if value is not None:
+                    heap += value.encode('utf-8')
+                offsets.append(len(heap))
+        
+        header = _SNAPSHOT_HEADER.pack(
+            SNAPSHOT_MAGIC, SNAPSHOT_VERSION, SNAPSHOT_HAS_VALUES if has_values else 0,
+            count, len(heap), aggregates._total, aggregates._compensation,
+            aggregates.min_seconds if count else math.nan,
+            aggregates.max_seconds if count else math.nan,
+            aggregates.min_item if count else -1,
+            aggregates.max_item if count else -1
+        )
+        # Снимок пишется во временный файл рядом и подменяет исходный целиком:
+        # сам path может быть отображен в память этой или другой коллекцией,
+        # и его обрезка привела бы к SIGBUS при чтении столбцов
+        descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                                 prefix='.snapshot-')
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                file.write(header)
+                file.write(_little_endian(self.seconds, 'd'))
+                file.write(bytes(self.codes))
+                file.write(b'\0' * (_align8(count) - count))
+                if has_values:
+                    file.write(_little_endian(offsets, 'Q'))
+                    file.write(heap)
+            # mkstemp создает файл с правами 0600; выставляем обычные права
+            os.chmod(temp_path, _new_file_mode(path))
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+    
+    @classmethod
+    def load_snapshot(cls, path: str) -> 'ColumnarTimeIntervalCollection':
+        """
+        Открывает двоичный снимок через mmap без разбора значений.
+        Столбцы коллекции - представления отображенного файла, агрегаты
+        берутся из заголовка, поэтому открытие не зависит от размера файла.
+        При первом изменении коллекции столбцы копируются в память.
+        
+        Args:
+            path: путь к файлу снимка
+            
+        Returns:
+            колоночная коллекция над снимком
+        """
+        with open(path, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            if size < _SNAPSHOT_HEADER.size:
+                raise ValueError(f"Файл слишком мал для снимка: {path}")
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        (magic, version, flags, count, heap_size, total, compensation,
+         min_seconds, max_seconds, min_index, max_index) = _SNAPSHOT_HEADER.unpack_from(mapped)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            mapped.close()
+            raise ValueError(f"Неизвестный формат снимка: {path}")
+        has_values = bool(flags & SNAPSHOT_HAS_VALUES)
+        seconds_start = _SNAPSHOT_HEADER.size
+        codes_start = seconds_start + 8 * count
+        offsets_start = _align8(codes_start + count)
+        heap_start = offsets_start + 8 * (count + 1)
+        expected = heap_start + heap_size if has_values else codes_start + count
+        if size < expected:
+            mapped.close()
+            raise ValueError(f"Снимок поврежден или обрезан: {path}")
+        
+        collection = cls(keep_values=has_values)
+        view = memoryview(mapped)
+        if sys.byteorder == 'little':
+            collection.seconds = view[seconds_start:codes_start].cast('d')
+            collection.codes = view[codes_start:codes_start + count]
+            if has_values:
+                collection.values = _SnapshotStrings(view[offsets_start:heap_start].cast('Q'),
+                                                     view[heap_start:heap_start + heap_size])
+            collection._snapshot = mapped
+        else:
+            # На big-endian платформе столбцы копируются с перестановкой байтов
+            collection.seconds = array('d', bytes(view[seconds_start:codes_start]))
+            collection.seconds.byteswap()
+            collection.codes = array('B', bytes(view[codes_start:codes_start + count]))
+            if has_values:
+                offsets = array('Q', bytes(view[offsets_start:heap_start]))
+                offsets.byteswap()
+                collection.values = list(_SnapshotStrings(offsets, view[heap_start:heap_start + heap_size]))
+            view.release()
+            mapped.close()
+        
+        aggregates = collection.aggregates
+        if count:
+            aggregates.set_totals(count, total, compensation)
+            aggregates.set_extremes(min_seconds, min_index, max_seconds, max_index)
+        return collection
+    
+    def resolve_item(self, item: int) -> TimeInterval:
+        """Интервал по элементу агрегатов (здесь элементы - позиции)"""
+        return self.interval_at(item)
+    
+    def _item_seconds(self, item: int) -> float:
+        return self.seconds[item]
+    
+    def query_aggregates(self, selectors: List['QuerySelector']) -> List[RunningAggregates]:
+        """
+        Считает агрегаты для нескольких выборок за один проход.
+        С NumPy каждое сравнение столбца (код формата, нижняя или верхняя
+        граница) вычисляется один раз на различное значение и переиспользуется
+        всеми выборками; выборки с одинаковыми границами делят один отбор
+        позиций, а формат проверяется уже внутри него. Выборки с предикатом
+        считаются одним общим проходом по строкам, и интервал создается
+        только для строк, прошедших проверку формата и границ.
+        
+        Args:
+            selectors: условия отбора интервалов
+            
+        Returns:
+            агрегаты каждой выборки (элементы min/max - позиции)
+        """
+        results = [RunningAggregates() for _ in selectors]
+        scanned = [(selector, results[number]) for number, selector in enumerate(selectors)
+                   if np is None or selector.predicate is not None]
+        if np is not None and selectors:
+            self._query_vectorized(selectors, results)
+        if scanned:
+            self._query_scan(scanned)
+        return results
+    
+    def _query_vectorized(self, selectors: List['QuerySelector'],
+                          results: List[RunningAggregates]) -> None:
+        """Векторные агрегаты выборок без предиката (см. query_aggregates)"""
+        seconds, codes = self._seconds_view(), self._codes_view()
+        lower_masks: Dict[float, Any] = {}
+        upper_masks: Dict[float, Any] = {}
+        ranges: Dict[Tuple, List[int]] = {}  # (min, max) -> номера выборок
+        for number, selector in enumerate(selectors):
+            if selector.predicate is None:
+                ranges.setdefault((selector.min_seconds, selector.max_seconds), []).append(number)
+        
+        for (min_seconds, max_seconds), numbers in ranges.items():
+            mask = None
+            if min_seconds is not None:
+                if min_seconds not in lower_masks:
+                    lower_masks[min_seconds] = seconds >= min_seconds
+                mask = lower_masks[min_seconds]
+            if max_seconds is not None:
+                if max_seconds not in upper_masks:
+                    upper_masks[max_seconds] = seconds <= max_seconds
+                upper = upper_masks[max_seconds]
+                mask = upper if mask is None else mask & upper
+            if mask is None:
+                positions, picked_seconds, picked_codes = None, seconds, codes
+            else:
+                positions = np.flatnonzero(mask)
+                picked_seconds, picked_codes = seconds[positions], codes[positions]
+            
+            by_code: Dict[Optional[int], Any] = {}  # код -> позиции внутри отбора
+            for number in numbers:
+                code = selectors[number].format_code
+                if code not in by_code:
+                    by_code[code] = None if code is None else np.flatnonzero(picked_codes == code)
+                inner = by_code[code]
+                group = picked_seconds if inner is None else picked_seconds[inner]
+                if not len(group):
+                    continue
+                min_index, max_index = int(group.argmin()), int(group.argmax())
+                if inner is not None:
+                    min_index, max_index = int(inner[min_index]), int(inner[max_index])
+                if positions is not None:
+                    min_index, max_index = int(positions[min_index]), int(positions[max_index])
+                aggregates = results[number]
+                aggregates.set_totals(len(group), float(group.sum()))
+                aggregates.set_extremes(self.seconds[min_index], min_index,
+                                        self.seconds[max_index], max_index)
+    
+    def _query_scan(self, scanned: List[Tuple['QuerySelector', RunningAggregates]]) -> None:
+        """Общий построчный проход для выборок с предикатом или без NumPy"""
+        for index in range(len(self.seconds)):
+            seconds, code = self.seconds[index], self.codes[index]
+            interval = None
+            for selector, aggregates in scanned:
+                if not selector.matches_bounds(seconds, code):
+                    continue
+                if selector.predicate is not None:
+                    if interval is None:
+                        interval = self.interval_at(index)
+                    if not selector.predicate(interval):
+                        continue
+                aggregates.add(seconds, index)
+    
+    def _detach_snapshot(self) -> None:
+        """Копирует столбцы снимка в память, чтобы коллекцию можно было изменять"""
+        self.seconds = array('d', self.seconds)
+        self.codes = array('B', self.codes)
+        if self.values is not None:
+            self.values = list(self.values)
+        self.close()
+    
+    def close(self) -> None:
+        """
+        Освобождает отображенный снимок. Если столбцы еще указывают
+        на снимок, коллекция становится пустой.
+        
+        Если буфер столбца кем-то удерживается (экспорт самого
+        collection.seconds или collection.codes), выбрасывается BufferError,
+        а коллекция остается открытой и неизменной. Массивы NumPy и другие
+        представления поверх снимка закрытию не мешают: отображение
+        освобождается вместе с последним из них.
+        """
+        if self._snapshot is None:
+            return
+        if isinstance(self.seconds, memoryview):
+            strings = self.values if isinstance(self.values, _SnapshotStrings) else None
+            views = [self.seconds, self.codes]
+            if strings is not None:
+                views += [strings.offsets, strings.heap]
+            # Запасные представления того же буфера восстанавливают столбцы,
+            # если одно из представлений освободить нельзя
+            spares = [view[:] for view in views]
             try:
-                self.collection.add_from_string(
-                    interval_data['format'], 
-                    interval_data['value']
+                for view in views:
+                    view.release()
+            except BufferError:
+                self.seconds, self.codes = spares[0], spares[1]
+                if strings is not None:
+                    strings.offsets, strings.heap = spares[2], spares[3]
+                raise BufferError("Снимок нельзя закрыть: буфер столбца коллекции еще "
+                                  "удерживается внешним объектом") from None
+            for spare in spares:
+                spare.release()
+            self.seconds, self.codes, self.values = array('d'), array('B'), None
+            self.aggregates.reset()
+            if self._sorted_index is not None:
+                self._sorted_index.reset()
+            if self._format_index is not None:
+                self._format_index.reset()
+        try:
+            self._snapshot.close()
+        except BufferError:
+            pass  # внешние представления держат отображение до своего освобождения
+        self._snapshot = None
+    
+    def interval_at(self, index: int) -> TimeInterval:
+        """
+        Создает объект интервала по его позиции в коллекции.
+        
+        Args:
+            index: позиция интервала
+            
+        Returns:
+            объект TimeInterval соответствующего класса
+        """
+        cls = CODE_CLASSES[self.codes[index]]
+        seconds = self.seconds[index]
+        value = self.values[index] if self.values is not None else None
+        if value is None:
+            value = cls._value_from_seconds(seconds)
+        return cls._from_parsed(value, seconds)
+    
+    def iter_intervals(self) -> Iterator[TimeInterval]:
+        """Лениво перебирает интервалы коллекции в порядке добавления."""
+        for index in range(len(self.seconds)):
+            yield self.interval_at(index)
+    
+    def _seconds_view(self):
+        """Представление столбца секунд как массива NumPy без копирования"""
+        return np.frombuffer(self.seconds, dtype=np.float64)
+    
+    def _codes_view(self):
+        """Представление столбца кодов форматов как массива NumPy без копирования"""
+        return np.frombuffer(self.codes, dtype=np.uint8)
+    
+    def _intervals_at(self, positions) -> List[TimeInterval]:
+        """Создает объекты интервалов для списка позиций"""
+        return [self.interval_at(int(index)) for index in positions]
+    
+    def _extreme_index(self, largest: bool) -> int:
+        """Позиция первого максимального (или минимального) интервала"""
+        if np is not None:
+            view = self._seconds_view()
+            return int(view.argmax() if largest else view.argmin())
+        pick = max if largest else min
+        return pick(range(len(self.seconds)), key=self.seconds.__getitem__)
+    
+    def _sorted(self) -> SortedSecondsIndex:
+        """Отсортированный индекс, построенный или перестроенный при необходимости"""
+        if self._sorted_index is None:
+            self._sorted_index = SortedSecondsIndex(positional=True)
+            self._sorted_index.dirty = True
+        if self._sorted_index.dirty:
+            if np is not None:
+                # Перестановка и ключи остаются буферами NumPy и копируются в array
+                seconds = self._seconds_view()
+                order = np.argsort(seconds, kind='stable')
+                self._sorted_index.build_positions(seconds[order], order.astype(np.int64, copy=False))
+            else:
+                order = array('q', sorted(range(len(self.seconds)), key=self.seconds.__getitem__))
+                self._sorted_index.build_positions(array('d', map(self.seconds.__getitem__, order)), order)
+        return self._sorted_index
+    
+    def _extremes(self) -> RunningAggregates:
+        """Агрегаты с актуальными минимумом и максимумом"""
+        if self.aggregates.stale:
+            min_index = self._extreme_index(largest=False)
+            max_index = self._extreme_index(largest=True)
+            self.aggregates.set_extremes(self.seconds[min_index], min_index,
+                                         self.seconds[max_index], max_index)
+        return self.aggregates
+    
+    def filter_by_min_seconds(self, min_seconds: float) -> List[TimeInterval]:
+        """
+        Фильтрует интервалы по минимальной длительности.
+        
+        Args:
+            min_seconds: минимальная длительность в секундах
+            
+        Returns:
+            список интервалов, длительность которых >= min_seconds
+        """
+        if np is not None:
+            return self._intervals_at(np.flatnonzero(self._seconds_view() >= min_seconds))
+        return self._intervals_at(i for i, seconds in enumerate(self.seconds) if seconds >= min_seconds)
+    
+    def filter_by_max_seconds(self, max_seconds: float) -> List[TimeInterval]:
+        """
+        Фильтрует интервалы по максимальной длительности.
+        
+        Args:
+            max_seconds: максимальная длительность в секундах
+            
+        Returns:
+            список интервалов, длительность которых <= max_seconds
+        """
+        if np is not None:
+            return self._intervals_at(np.flatnonzero(self._seconds_view() <= max_seconds))
+        return self._intervals_at(i for i, seconds in enumerate(self.seconds) if seconds <= max_seconds)
+    
+    def find_by_format(self, format_name: str) -> List[TimeInterval]:
+        """
+        Находит все интервалы заданного формата.
+        
+        Args:
+            format_name: название формата для поиска
+            
+        Returns:
+            список интервалов заданного формата
+        """
+        code = _resolve_format_code(format_name)
+        if code is None:
+            return []
+        return self._intervals_at(self._formats().members.get(code, ()))
+    
+    def _formats(self) -> FormatIndex:
+        """Индекс по форматам, построенный или перестроенный при необходимости"""
+        if self._format_index is None:
+            self._format_index = FormatIndex(positional=True)
+            self._format_index.dirty = True
+        index = self._format_index
+        if index.dirty:
+            index.reset()
+            if np is not None:
+                # Одна устойчивая сортировка по коду: позиции каждого формата -
+                # непрерывный отрезок перестановки в порядке добавления
+                codes, seconds = self._codes_view(), self._seconds_view()
+                order = np.argsort(codes, kind='stable').astype(np.int64, copy=False)
+                start = 0
+                for code, count in enumerate(np.bincount(codes).tolist()):
+                    if not count:
+                        continue
+                    positions = order[start:start + count]
+                    start += count
+                    group = seconds[positions]
+                    min_index = int(positions[group.argmin()])
+                    max_index = int(positions[group.argmax()])
+                    aggregates = RunningAggregates()
+                    aggregates.set_totals(count, float(group.sum()))
+                    aggregates.set_extremes(self.seconds[min_index], min_index,
+                                            self.seconds[max_index], max_index)
+                    index.set_group(code, positions, aggregates)
+            else:
+                index.add_batch(self.codes, self.seconds, range(len(self.seconds)))
+        return index
+    
+    def print_all(self) -> None:
+        """Выводит информацию о всех интервалах в коллекции."""
+        print(f"\nКоллекция содержит {self.get_count()} интервалов:")
+        print("-" * 60)
+        for i, interval in enumerate(self.iter_intervals(), 1):
+            print(f"{i:3d}. {interval}")
+        print("-" * 60)
+
+
+# ПОТОКОВАЯ ЗАГРУЗКА ИЗ ФАЙЛОВ
+
+
+class LoadReport:
+    """
+    Итог загрузки: число загруженных строк и ошибочные строки.
+    Хранятся только первые max_errors ошибок, остальные лишь считаются.
+    """
+    
+    def __init__(self, source: str, max_errors: int = 100):
+        self.source = source
+        self.max_errors = max_errors
+        self.loaded = 0
+        self.error_count = 0
+        self.errors: List[Tuple[int, str, str]] = []  # (номер строки, строка, сообщение)
+    
+    def add_error(self, line_number: int, row: Any, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((line_number, str(row), message))
+    
+    def print_report(self) -> None:
+        """Выводит итог загрузки и ошибочные строки."""
+        print(f"\nЗагрузка из {self.source}: загружено {self.loaded}, ошибок {self.error_count}")
+        for line_number, row, message in self.errors:
+            print(f"  строка {line_number}: {row} - {message}")
+        if self.error_count > len(self.errors):
+            print(f"  ... и еще {self.error_count - len(self.errors)} ошибок")
+
+
+class _SplitRows:
+    """Ленивые строки пачки CSV поверх плоского списка полей [f0, v0, f1, v1, ...]"""
+    
+    __slots__ = ('fields',)
+    
+    def __init__(self, fields: List[str]):
+        self.fields = fields
+    
+    def __len__(self) -> int:
+        return len(self.fields) // 2
+    
+    def __getitem__(self, index: int) -> List[str]:
+        return self.fields[2 * index:2 * index + 2]
+
+
+class IntervalFileLoader:
+    """
+    Потоковый загрузчик интервалов из CSV/JSONL файлов и stdin.
+    
+    Строки читаются пачками по batch_size и раскладываются в столбцы
+    форматов и значений. Класс формата находится по таблице FORMAT_CLASSES
+    один раз на каждый различный ключ, значения одного формата разбираются
+    одним вызовом parse_batch и добавляются в коллекцию через extend_parsed
+    без создания промежуточных объектов. Ошибочные строки попадают
+    в LoadReport, загрузка продолжается.
+    
+    CSV: столбцы format,value (заголовок необязателен).
+    JSONL: объекты {"format": ..., "value": ...}, по одному на строку.
+    """
+    
+    NO_CODE = 255  # код строки без разобранного формата в смешанной пачке
+    
+    def __init__(self, collection, batch_size: int = 65536, max_errors: int = 100):
+        """
+        Args:
+            collection: коллекция с методом extend_parsed
+            batch_size: число строк в пачке
+            max_errors: сколько ошибочных строк сохранять в отчете
+        """
+        self.collection = collection
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self._format_codes: Dict[str, int] = {}  # исходный ключ формата -> код
+    
+    def load_file(self, path: str, file_format: Optional[str] = None) -> LoadReport:
+        """
+        Загружает интервалы из файла; путь '-' означает stdin.
+        
+        Args:
+            path: путь к файлу
+            file_format: 'csv' или 'jsonl'; по умолчанию - по расширению
+            
+        Returns:
+            отчет о загрузке
+        """
+        if file_format is None:
+            file_format = 'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
+        if path == '-':
+            return self.load_stream(sys.stdin, file_format, source='stdin')
+        with open(path, 'r', encoding='utf-8', newline='') as stream:
+            return self.load_stream(stream, file_format, source=path)
+    
+    def load_stream(self, stream: TextIO, file_format: str = 'csv',
+                    source: str = '<stream>') -> LoadReport:
+        """
+        Загружает интервалы из открытого текстового потока.
+        
+        Args:
+            stream: текстовый поток
+            file_format: 'csv' или 'jsonl'
+            source: название источника для отчета
+            
+        Returns:
+            отчет о загрузке
+        """
+        if file_format == 'csv':
+            batches = self._csv_batches(stream)
+        elif file_format == 'jsonl':
+            batches = self._jsonl_batches(stream)
+        else:
+            raise ValueError(f"Неизвестный формат файла: {file_format}")
+        
+        report = LoadReport(source, self.max_errors)
+        for first_line, rows, formats, values in batches:
+            self._load_batch(first_line, rows, formats, values, report)
+        return report
+    
+    def _csv_batches(self, stream: TextIO) -> Iterator[Tuple[int, Any, List, List]]:
+        """
+        Пачки CSV: (номер первой строки, строки, столбец форматов, столбец значений).
+        Пачка, где каждая строка - ровно два поля без кавычек, разбирается
+        одним split по всему тексту пачки; с первой пачки с кавычками,
+        пустыми или лишними полями остаток файла читает csv.reader.
+        """
+        format_column, value_column = 0, 1
+        first_line = 1
+        lines = list(itertools.islice(stream, self.batch_size))
+        if lines:
+            header = [name.strip().lower() for name in next(csv.reader(lines[:1]), [])]
+            if 'format' in header and 'value' in header:
+                format_column, value_column = header.index('format'), header.index('value')
+                lines = lines[1:]
+                first_line = 2
+        while lines:
+            fields = self._split_fields(lines)
+            if fields is None:
+                yield from self._csv_reader_batches(
+                    csv.reader(itertools.chain(lines, stream)), first_line, format_column, value_column
                 )
-            except ValueError as e:
-                print(f"Ошибка при загрузке интервала {interval_data}: {e}")
+                return
+            yield first_line, _SplitRows(fields), fields[format_column::2], fields[value_column::2]
+            first_line += len(lines)
+            lines = list(itertools.islice(stream, self.batch_size))
+    
+    @staticmethod
+    def _split_fields(lines: List[str]) -> Optional[List[str]]:
+        """Плоский список полей [f0, v0, f1, v1, ...] или None, если пачке нужен csv.reader"""
+        if set(map(str.count, lines, itertools.repeat(','))) != {1}:
+            return None
+        text = ''.join(lines)
+        if '\r' in text:
+            text = text.replace('\r\n', '\n')
+        if '"' in text or '\r' in text:
+            return None
+        if text.endswith('\n'):
+            text = text[:-1]
+        return text.replace('\n', ',').split(',')
+    
+    def _csv_reader_batches(self, reader: Iterator[List[str]], first_line: int, format_column: int,
+                            value_column: int) -> Iterator[Tuple[int, List, List, List]]:
+        """Пачки CSV через csv.reader (кавычки, переводы строк в полях, короткие строки)"""
+        rows = list(itertools.islice(reader, self.batch_size))
+        while rows:
+            try:
+                formats = [row[format_column] for row in rows]
+                values = [row[value_column] for row in rows]
+            except IndexError:
+                # Короткие или пустые строки: раскладываем построчно
+                width = max(format_column, value_column)
+                formats = [row[format_column] if len(row) > width else None for row in rows]
+                values = [row[value_column] if len(row) > width else None for row in rows]
+            yield first_line, rows, formats, values
+            first_line += len(rows)
+            rows = list(itertools.islice(reader, self.batch_size))
+    
+    def _jsonl_batches(self, stream: TextIO) -> Iterator[Tuple[int, List, List, List]]:
+        """Пачки JSONL: (номер первой строки, строки, столбец форматов, столбец значений)"""
+        first_line = 1
+        lines = list(itertools.islice(stream, self.batch_size))
+        while lines:
+            formats, values = [], []
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                    if not isinstance(record['format'], str):
+                        raise TypeError(record['format'])
+                    formats.append(record['format'])
+                    values.append(str(record['value']))
+                except (ValueError, KeyError, TypeError):
+                    formats.append(None)
+                    values.append(None)
+            yield first_line, [line.strip() for line in lines], formats, values
+            first_line += len(lines)
+            lines = list(itertools.islice(stream, self.batch_size))
+    
+    def _format_code(self, format_type: str) -> int:
+        code = self._format_codes.get(format_type)
+        if code is None:
+            code = FORMAT_CODES[TimeIntervalFactory.resolve_class(format_type)]
+            self._format_codes[format_type] = code
+        return code
+    
+    def _load_batch(self, first_line: int, rows: Any, formats: List[Optional[str]],
+                    values: List[Optional[str]], report: LoadReport) -> None:
+        """Разбирает пачку по группам форматов и добавляет в коллекцию"""
+        codes: Dict[str, int] = {}
+        bad_formats: Dict[Any, str] = {}
+        distinct = set(formats)
+        for format_type in distinct:
+            if format_type is None:
+                continue
+            try:
+                codes[format_type] = self._format_code(format_type)
+            except (ValueError, AttributeError, TypeError) as e:
+                bad_formats[format_type] = str(e)
+        
+        if len(distinct) == 1 and codes:
+            # Частый случай: однородная пачка одного формата
+            code = codes[formats[0]]
+            try:
+                seconds = CODE_CLASSES[code].parse_batch(values)
+            except ValueError:
+                pass
+            else:
+                self.collection.extend_parsed(array('B', [code]) * len(values), seconds, values)
+                report.loaded += len(values)
+                return
+        
+        errors: List[Tuple[int, Any, str]] = []
+        if bad_formats or None in distinct:
+            for position, format_type in enumerate(formats):
+                if format_type in bad_formats:
+                    errors.append((first_line + position, rows[position], bad_formats[format_type]))
+                elif format_type is None and rows[position]:
+                    errors.append((first_line + position, rows[position], "ожидались поля format и value"))
+        
+        parse_mixed = self._parse_mixed_vectorized if np is not None else self._parse_mixed
+        good_codes, good_seconds, good_values = parse_mixed(first_line, rows, formats, values, codes, errors)
+        self.collection.extend_parsed(good_codes, good_seconds, good_values)
+        report.loaded += len(good_codes)
+        for error in sorted(errors, key=lambda item: item[0]):
+            report.add_error(*error)
+    
+    def _parse_mixed_vectorized(self, first_line: int, rows: Any, formats: List[Optional[str]],
+                                values: List[Optional[str]], codes: Dict[str, int],
+                                errors: List) -> Tuple[array, array, List[str]]:
+        """
+        Разбор смешанной пачки с NumPy: коды строк - одним проходом map,
+        позиции каждого формата - срез одной устойчивой сортировки по коду,
+        секунды групп раскладываются обратно по позициям пачки.
+        
+        Returns:
+            столбцы кодов, секунд и значений разобранных строк в порядке пачки
+        """
+        size = len(formats)
+        row_codes = np.fromiter(map(codes.get, formats, itertools.repeat(self.NO_CODE)),
+                                dtype=np.uint8, count=size)
+        order = np.argsort(row_codes, kind='stable')
+        counts = np.bincount(row_codes, minlength=self.NO_CODE + 1)
+        valid = row_codes != self.NO_CODE
+        seconds = np.zeros(size)
+        start = 0
+        for code in np.flatnonzero(counts[:self.NO_CODE]).tolist():
+            positions = order[start:start + counts[code]]
+            start += counts[code]
+            cls = CODE_CLASSES[code]
+            group_values = list(map(values.__getitem__, positions.tolist()))
+            try:
+                seconds[positions] = cls.parse_batch(group_values)
+            except ValueError:
+                # В группе есть ошибочные значения: разбираем ее построчно
+                for position, value in zip(positions.tolist(), group_values):
+                    try:
+                        seconds[position] = cls.parse_seconds(value)
+                    except ValueError as e:
+                        valid[position] = False
+                        errors.append((first_line + position, rows[position], str(e)))
+        
+        if valid.all():
+            return _as_array('B', row_codes), _as_array('d', seconds), values
+        good = np.flatnonzero(valid)
+        return (_as_array('B', row_codes[good]), _as_array('d', seconds[good]),
+                list(map(values.__getitem__, good.tolist())))
+    
+    def _parse_mixed(self, first_line: int, rows: Any, formats: List[Optional[str]],
+                     values: List[Optional[str]], codes: Dict[str, int],
+                     errors: List) -> Tuple[List[int], List[float], List[str]]:
+        """Разбор смешанной пачки без NumPy: позиции групп собираются списками"""
+        groups: Dict[int, List[int]] = {}  # код формата -> позиции в пачке
+        for format_type, code in codes.items():
+            positions = [position for position, item in enumerate(formats) if item == format_type]
+            groups.setdefault(code, []).extend(positions)
+        if len(groups) < len(codes):
+            # Разные ключи одного формата ('hms' и 'HMS'): восстанавливаем порядок
+            for positions in groups.values():
+                positions.sort()
+        
+        seconds: List[Optional[float]] = [None] * len(formats)
+        for code, positions in groups.items():
+            cls = CODE_CLASSES[code]
+            group_values = [values[position] for position in positions]
+            try:
+                parsed = cls.parse_batch(group_values)
+            except ValueError:
+                # В группе есть ошибочные значения: разбираем ее построчно
+                parsed = []
+                for position, value in zip(positions, group_values):
+                    try:
+                        parsed.append(cls.parse_seconds(value))
+                    except ValueError as e:
+                        parsed.append(None)
+                        errors.append((first_line + position, rows[position], str(e)))
+            for position, item in zip(positions, parsed):
+                seconds[position] = item
+        
+        good = [position for position, item in enumerate(seconds) if item is not None]
+        return ([codes[formats[position]] for position in good],
+                [seconds[position] for position in good],
+                [values[position] for position in good])
+
+
+# ПАРАЛЛЕЛЬНАЯ ЗАГРУЗКА ФАЙЛОВ
+
+
+def _log2_bucket(seconds: float) -> int:
+    """Номер логарифмической корзины: k >= 1 - секунды в [2^(k-1), 2^k), 0 - меньше секунды"""
+    return math.frexp(seconds)[1] if seconds >= 1 else 0
+
+
+class _ParsedRows:
+    """Ленивая последовательность пар (код формата, значение) по столбцам пачки"""
+    
+    __slots__ = ('codes', 'values')
+    
+    def __init__(self, codes: List[int], values: List[str]):
+        self.codes = codes
+        self.values = values
+    
+    def __getitem__(self, index: int) -> Tuple[int, str]:
+        return self.codes[index], self.values[index]
+
+
+class QuantileSketch:
+    """
+    Скетч квантилей в стиле DDSketch: значение x попадает в корзину
+    ceil(log_gamma(x)), где gamma = (1 + a) / (1 - a). Любой квантиль
+    оценивается с относительной погрешностью не больше a, память
+    ограничена max_buckets корзинами (при переполнении сливаются самые
+    младшие корзины), а скетчи с одинаковой точностью объединяются
+    сложением счетчиков.
+    """
+    
+    MIN_POSITIVE = 1e-9  # значения по модулю меньше считаются нулем
+    
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        """
+        Args:
+            relative_accuracy: допустимая относительная погрешность квантилей
+            max_buckets: наибольшее число корзин для каждого знака
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f"Относительная точность должна быть в (0, 1): {relative_accuracy}")
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._inverse_log_gamma = 1 / math.log(self.gamma)
+        self.positive: Counter = Counter()
+        self.negative: Counter = Counter()  # корзины модулей отрицательных значений
+        self.zero_count = 0
+        self.count = 0
+    
+    def _bucket(self, value: float) -> int:
+        return math.ceil(math.log(value) * self._inverse_log_gamma)
+    
+    def _bucket_value(self, bucket: int) -> float:
+        """Оценка значений корзины с наименьшей относительной погрешностью"""
+        return 2 * self.gamma ** bucket / (self.gamma + 1)
+    
+    def add(self, value: float) -> None:
+        """Учитывает одно значение."""
+        self.add_batch([value])
+    
+    def add_batch(self, values: List[float]) -> None:
+        """
+        Учитывает пачку значений; с NumPy номера корзин считаются векторно.
+        
+        Args:
+            values: значения в секундах
+        """
+        self.count += len(values)
+        if np is not None and len(values) > 64:
+            data = np.asarray(values, dtype=np.float64)
+            for store, part in ((self.positive, data[data > self.MIN_POSITIVE]),
+                                (self.negative, -data[data < -self.MIN_POSITIVE])):
+                if len(part):
+                    buckets, counts = np.unique(np.ceil(np.log(part) * self._inverse_log_gamma),
+                                                return_counts=True)
+                    store.update(dict(zip(buckets.astype(np.int64).tolist(), counts.tolist())))
+                    self._collapse(store)
+            self.zero_count += int(np.count_nonzero(np.abs(data) <= self.MIN_POSITIVE))
+            return
+        for value in values:
+            if value > self.MIN_POSITIVE:
+                self.positive[self._bucket(value)] += 1
+            elif value < -self.MIN_POSITIVE:
+                self.negative[self._bucket(-value)] += 1
+            else:
+                self.zero_count += 1
+        self._collapse(self.positive)
+        self._collapse(self.negative)
+    
+    def _collapse(self, store: Counter) -> None:
+        """Сливает самые младшие корзины, пока их не больше max_buckets"""
+        if len(store) <= self.max_buckets:
+            return
+        buckets = sorted(store)
+        excess = buckets[:len(buckets) - self.max_buckets + 1]
+        target = excess[-1]
+        store[target] += sum(store.pop(bucket) for bucket in excess[:-1])
+    
+    def merge(self, other: 'QuantileSketch') -> None:
+        """
+        Добавляет счетчики другого скетча с той же точностью.
+        
+        Args:
+            other: объединяемый скетч
+        """
+        if other.gamma != self.gamma:
+            raise ValueError("Нельзя объединить скетчи с разной относительной точностью")
+        self.positive.update(other.positive)
+        self.negative.update(other.negative)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self._collapse(self.positive)
+        self._collapse(self.negative)
+    
+    def quantile(self, q: float) -> float:
+        """
+        Оценка квантиля.
+        
+        Args:
+            q: доля от 0 до 1
+            
+        Returns:
+            значение квантиля
+        """
+        if not self.count:
+            raise ValueError("Квантиль пустого скетча не определен")
+        if not 0 <= q <= 1:
+            raise ValueError(f"Доля должна быть от 0 до 1: {q}")
+        rank = q * (self.count - 1)
+        seen = 0
+        for bucket in sorted(self.negative, reverse=True):
+            seen += self.negative[bucket]
+            if seen > rank:
+                return -self._bucket_value(bucket)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for bucket in sorted(self.positive):
+            seen += self.positive[bucket]
+            if seen > rank:
+                return self._bucket_value(bucket)
+        return self._bucket_value(max(self.positive))
+
+
+class IntervalAggregate:
+    """
+    Сводка по интервалам с памятью, не зависящей от их числа:
+    точные количество, сумма, минимум и максимум (с исходным значением),
+    агрегаты по каждому формату, логарифмическая гистограмма
+    длительностей и скетч квантилей (QuantileSketch) для медианы
+    и процентилей.
+    
+    Сводки разных частей данных объединяются методом merge, поэтому
+    файлы и потоки можно обрабатывать параллельно. Интерфейс
+    add_from_string/sum/avg/max/min/get_count совпадает с коллекциями,
+    так что сводку можно передать в TimeIntervalProcessor вместо коллекции.
+    """
+    
+    def __init__(self, relative_accuracy: float = 0.01):
+        """
+        Args:
+            relative_accuracy: относительная погрешность процентилей
+        """
+        self.aggregates = RunningAggregates()  # элементы min/max - пары (код, значение)
+        self.formats: Dict[int, RunningAggregates] = {}
+        self.histogram: Counter = Counter()
+        self.sketch = QuantileSketch(relative_accuracy)
+    
+    def extend_parsed(self, codes: List[int], seconds: List[float], values: List[str]) -> None:
+        """
+        Учитывает пачку разобранных интервалов (используется загрузчиком).
+        
+        Args:
+            codes: коды форматов (индексы в CODE_CLASSES)
+            seconds: длительности в секундах
+            values: исходные строки
+        """
+        if not seconds:
+            return
+        seconds = list(seconds)
+        self.aggregates.add_batch(seconds, _ParsedRows(codes, values))
+        distinct = set(codes)
+        for code in distinct:
+            if len(distinct) == 1:
+                picked_seconds, picked_values = seconds, values
+            else:
+                picked = [i for i, item in enumerate(codes) if item == code]
+                picked_seconds = [seconds[i] for i in picked]
+                picked_values = [values[i] for i in picked]
+            aggregates = self.formats.get(code)
+            if aggregates is None:
+                aggregates = self.formats[code] = RunningAggregates()
+            aggregates.add_batch(picked_seconds, _ParsedRows([code] * len(picked_values), picked_values))
+        self.histogram.update(map(_log2_bucket, seconds))
+        self.sketch.add_batch(seconds)
+    
+    def add_interval(self, interval: TimeInterval) -> None:
+        """
+        Учитывает интервал.
+        
+        Args:
+            interval: объект временного интервала
+        """
+        self.extend_parsed([FORMAT_CODES[type(interval)]], [interval.get_seconds()], [interval.value])
+    
+    def add_from_string(self, format_type: str, value: str) -> None:
+        """
+        Разбирает и учитывает интервал, заданный строкой.
+        
+        Args:
+            format_type: тип формата
+            value: значение интервала
+        """
+        self.add_interval(TimeIntervalFactory.create_interval(format_type, value))
+    
+    def merge(self, other: 'IntervalAggregate') -> 'IntervalAggregate':
+        """
+        Добавляет сводку другой части данных.
+        
+        Args:
+            other: объединяемая сводка
+            
+        Returns:
+            эта же сводка (для цепочек)
+        """
+        self.aggregates.merge(other.aggregates)
+        for code, aggregates in other.formats.items():
+            if code not in self.formats:
+                self.formats[code] = RunningAggregates()
+            self.formats[code].merge(aggregates)
+        self.histogram.update(other.histogram)
+        self.sketch.merge(other.sketch)
+        return self
+    
+    def get_count(self) -> int:
+        """
+        Возвращает количество учтенных интервалов.
+        
+        Returns:
+            количество интервалов
+        """
+        return self.aggregates.count
+    
+    @staticmethod
+    def _resolve(item: Tuple[int, str]) -> TimeInterval:
+        code, value = item
+        cls = CODE_CLASSES[code]
+        return cls._from_parsed(value, cls.parse_seconds(value))
+    
+    def sum(self) -> Dict[str, Any]:
+        """Сумма всех интервалов (словарь как у TimeIntervalCollection.sum)"""
+        return _aggregate_result(self.aggregates, "sum", self._resolve)
+    
+    def avg(self) -> Dict[str, Any]:
+        """Среднее значение интервалов"""
+        return _aggregate_result(self.aggregates, "avg", self._resolve)
+    
+    def max(self) -> Dict[str, Any]:
+        """Максимальный интервал"""
+        return _aggregate_result(self.aggregates, "max", self._resolve)
+    
+    def min(self) -> Dict[str, Any]:
+        """Минимальный интервал"""
+        return _aggregate_result(self.aggregates, "min", self._resolve)
+    
+    def aggregate_by_format(self, format_name: str, command: str) -> Dict[str, Any]:
+        """
+        Вычисляет sum/avg/max/min по интервалам одного формата.
+        
+        Args:
+            format_name: название ("Секунды") или ключ ("seconds") формата
+            command: sum, avg, max или min
+            
+        Returns:
+            словарь с результатом в разных форматах
+        """
+        code = _resolve_format_code(format_name)
+        if code is None:
+            raise ValueError(f"Неизвестный формат временного интервала: {format_name}")
+        return _aggregate_result(self.formats.get(code) or RunningAggregates(), command, self._resolve)
+    
+    def percentile(self, percent: float) -> float:
+        """
+        Оценка процентиля длительности по скетчу (в пределах точных min и max).
+        
+        Args:
+            percent: процент от 0 до 100
+            
+        Returns:
+            значение процентиля в секундах
+        """
+        if not 0 <= percent <= 100:
+            raise ValueError(f"Процент должен быть от 0 до 100: {percent}")
+        if not self.aggregates.count:
+            raise ValueError("Процентиль пустой сводки не определен")
+        estimate = self.sketch.quantile(percent / 100)
+        return min(max(estimate, self.aggregates.min_seconds), self.aggregates.max_seconds)
+    
+    def median(self) -> float:
+        """
+        Оценка медианы длительности в секундах.
+        
+        Returns:
+            медиана в секундах
+        """
+        return self.percentile(50)
+    
+    def format_counts(self) -> Dict[str, int]:
+        """
+        Количество интервалов каждого формата.
+        
+        Returns:
+            словарь: название формата -> количество
+        """
+        names = list(FORMAT_NAME_CODES)
+        return {names[code]: aggregates.count for code, aggregates in sorted(self.formats.items())}
+    
+    def histogram_buckets(self) -> List[Tuple[float, float, int]]:
+        """
+        Гистограмма длительностей по степеням двойки.
+        
+        Returns:
+            список (нижняя граница, верхняя граница, количество) в секундах
+        """
+        return [(0.0 if bucket == 0 else 2.0 ** (bucket - 1), 2.0 ** bucket, count)
+                for bucket, count in sorted(self.histogram.items())]
+
+
+def _aggregate_file(path: str, file_format: Optional[str],
+                    batch_size: int) -> Tuple[IntervalAggregate, LoadReport]:
+    """Разбирает один файл в отдельном процессе и возвращает его сводку"""
+    aggregate = IntervalAggregate()
+    report = IntervalFileLoader(aggregate, batch_size).load_file(path, file_format)
+    return aggregate, report
+
+
+def aggregate_files_parallel(paths: List[str], workers: Optional[int] = None,
+                             file_format: Optional[str] = None,
+                             batch_size: int = 65536) -> Tuple[IntervalAggregate, List[LoadReport]]:
+    """
+    Разбирает файлы в пуле процессов (один файл - одна задача) и
+    объединяет сводки в порядке списка. Общая коллекция не создается:
+    между процессами передаются только небольшие сводки.
+    
+    Args:
+        paths: пути к CSV/JSONL файлам
+        workers: число процессов (по умолчанию - число ядер)
+        file_format: 'csv' или 'jsonl'; по умолчанию - по расширению каждого файла
+        batch_size: число строк в пачке разбора
+        
+    Returns:
+        объединенная сводка и отчеты о загрузке по каждому файлу
+    """
+    total = IntervalAggregate()
+    reports = []
+    if not paths:
+        return total, reports
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        shards = executor.map(_aggregate_file, paths, itertools.repeat(file_format),
+                              itertools.repeat(batch_size))
+        for aggregate, report in shards:
+            total.merge(aggregate)
+            reports.append(report)
+    return total, reports
+
+
+# АГРЕГАЦИЯ ПО ВРЕМЕННЫМ ОКНАМ
+
+
+class WindowedAggregator:
+    """
+    Агрегаты sum/avg/max/min по временным окнам над потоком записей
+    (отметка времени, интервал), например задержки запросов по минутам.
+    
+    Время делится на корзины длиной step_seconds; кольцевой буфер хранит
+    RunningAggregates последних window_seconds / step_seconds корзин.
+    Событие обновляет одну корзину за O(1), корзины старше окна
+    вытесняются при переходе кольца, память ограничена числом корзин.
+    
+    step_seconds = window_seconds (по умолчанию) - скользящих окон нет,
+    окна «кувыркаются» (tumbling); меньший шаг дает скользящие окна.
+    При каждом переходе через границу шага закрытое окно сохраняется
+    в closed_windows и передается в on_window_closed.
+    
+    Закрытые окна не пересчитываются: событие из корзины раньше текущей
+    уже не попало бы в часть своих окон, поэтому оно отбрасывается
+    и считается в late_events. Корзины хранят и агрегаты по форматам
+    для aggregate_by_format.
+    """
+    
+    def __init__(self, window_seconds: float = 60, step_seconds: Optional[float] = None,
+                 history: int = 1000,
+                 on_window_closed: Optional[Callable[[float, float, RunningAggregates], None]] = None):
+        """
+        Args:
+            window_seconds: длина окна в секундах
+            step_seconds: шаг окна (длина корзины); по умолчанию равен окну
+            history: сколько закрытых окон хранить в closed_windows
+            on_window_closed: вызывается с (начало, конец, агрегаты) закрытого окна
+        """
+        step_seconds = step_seconds or window_seconds
+        buckets = window_seconds / step_seconds
+        if step_seconds <= 0 or buckets < 1 or abs(buckets - round(buckets)) > 1e-9:
+            raise ValueError("Длина окна должна быть положительным кратным шага")
+        self.window_seconds = window_seconds
+        self.step_seconds = step_seconds
+        self.window_buckets = int(round(buckets))
+        self.on_window_closed = on_window_closed
+        self.closed_windows: deque = deque(maxlen=history)
+        self.late_events = 0
+        self.reset()
+    
+    def reset(self) -> None:
+        """Очищает окна и закрытую историю."""
+        self._bucket_ids: List[Optional[int]] = [None] * self.window_buckets
+        self._buckets = [RunningAggregates() for _ in range(self.window_buckets)]
+        self._bucket_formats: List[Dict[int, RunningAggregates]] = [{} for _ in range(self.window_buckets)]
+        self._current: Optional[int] = None  # корзина последнего по времени события
+        self.closed_windows.clear()
+        self.late_events = 0
+    
+    @staticmethod
+    def _timestamp(moment: Union[float, datetime]) -> float:
+        return moment.timestamp() if isinstance(moment, datetime) else float(moment)
+    
+    def add(self, moment: Union[float, datetime], interval: TimeInterval) -> None:
+        """
+        Учитывает интервал, зафиксированный в момент moment.
+        События из корзин раньше текущей отбрасываются и считаются
+        в late_events: окна, заканчивающиеся до текущей корзины, уже закрыты.
+        
+        Args:
+            moment: отметка времени (секунды эпохи или datetime)
+            interval: объект временного интервала
+        """
+        bucket_id = math.floor(self._timestamp(moment) / self.step_seconds)
+        if self._current is None or bucket_id > self._current:
+            self._advance(bucket_id)
+        elif bucket_id < self._current:
+            self.late_events += 1
+            return
+        slot = bucket_id % self.window_buckets
+        formats = self._bucket_formats[slot]
+        if self._bucket_ids[slot] != bucket_id:
+            # Слот занят корзиной, вышедшей из окна: вытесняем ее
+            self._bucket_ids[slot] = bucket_id
+            self._buckets[slot].reset()
+            formats.clear()
+        seconds = interval.get_seconds()
+        self._buckets[slot].add(seconds, interval)
+        code = FORMAT_CODES[type(interval)]
+        aggregates = formats.get(code)
+        if aggregates is None:
+            aggregates = formats[code] = RunningAggregates()
+        aggregates.add(seconds, interval)
+    
+    def add_from_string(self, moment: Union[float, datetime], format_type: str, value: str) -> None:
+        """
+        Разбирает и учитывает интервал, заданный строкой.
+        
+        Args:
+            moment: отметка времени (секунды эпохи или datetime)
+            format_type: тип формата
+            value: значение интервала
+        """
+        self.add(moment, TimeIntervalFactory.create_interval(format_type, value))
+    
+    def _window(self, end_bucket: int, code: Optional[int] = None) -> RunningAggregates:
+        """
+        Объединенные агрегаты корзин окна, заканчивающегося корзиной end_bucket;
+        при заданном code - только интервалов этого формата.
+        """
+        window = RunningAggregates()
+        for bucket_id in range(end_bucket - self.window_buckets + 1, end_bucket + 1):
+            slot = bucket_id % self.window_buckets
+            if self._bucket_ids[slot] != bucket_id:
+                continue
+            bucket = self._buckets[slot] if code is None else self._bucket_formats[slot].get(code)
+            if bucket is not None:
+                window.merge(bucket)
+        return window
+    
+    def _close(self, end_bucket: int) -> None:
+        window = self._window(end_bucket)
+        if not window.count:
+            return
+        end = (end_bucket + 1) * self.step_seconds
+        self.closed_windows.append((end - self.window_seconds, end, window))
+        if self.on_window_closed is not None:
+            self.on_window_closed(end - self.window_seconds, end, window)
+    
+    def _advance(self, bucket_id: int) -> None:
+        """Закрывает окна, заканчивающиеся до корзины bucket_id"""
+        if self._current is not None:
+            # Через window_buckets шагов все корзины пусты: дальше закрывать нечего
+            for end_bucket in range(self._current, min(bucket_id, self._current + self.window_buckets)):
+                self._close(end_bucket)
+        self._current = bucket_id
+    
+    def flush(self) -> None:
+        """
+        Закрывает все окна, содержащие последние события (конец потока):
+        текущее и, для скользящих окон, еще window_buckets - 1 следующих.
+        """
+        if self._current is not None:
+            self._advance(self._current + self.window_buckets)
+            self._current = None
+            self._bucket_ids = [None] * self.window_buckets
+    
+    def current_window(self) -> RunningAggregates:
+        """
+        Агрегаты текущего (еще открытого) окна.
+        
+        Returns:
+            объединенные агрегаты последних корзин
+        """
+        if self._current is None:
+            return RunningAggregates()
+        return self._window(self._current)
+    
+    def get_count(self) -> int:
+        """Количество интервалов в текущем окне"""
+        return self.current_window().count
+    
+    def sum(self) -> Dict[str, Any]:
+        """Сумма интервалов текущего окна"""
+        return _aggregate_result(self.current_window(), "sum", lambda interval: interval)
+    
+    def avg(self) -> Dict[str, Any]:
+        """Среднее значение интервалов текущего окна"""
+        return _aggregate_result(self.current_window(), "avg", lambda interval: interval)
+    
+    def max(self) -> Dict[str, Any]:
+        """Максимальный интервал текущего окна"""
+        return _aggregate_result(self.current_window(), "max", lambda interval: interval)
+    
+    def min(self) -> Dict[str, Any]:
+        """Минимальный интервал текущего окна"""
+        return _aggregate_result(self.current_window(), "min", lambda interval: interval)
+    
+    def aggregate_by_format(self, format_name: str, command: str) -> Dict[str, Any]:
+        """
+        Вычисляет sum/avg/max/min по интервалам одного формата в текущем окне.
+        
+        Args:
+            format_name: название ("Секунды") или ключ ("seconds") формата
+            command: sum, avg, max или min
+            
+        Returns:
+            словарь с результатом в разных форматах
+        """
+        code = _resolve_format_code(format_name)
+        if code is None:
+            raise ValueError(f"Неизвестный формат временного интервала: {format_name}")
+        if self._current is None:
+            return _aggregate_result(RunningAggregates(), command, lambda interval: interval)
+        return _aggregate_result(self._window(self._current, code), command, lambda interval: interval)
+    
+    @staticmethod
+    def window_result(window: RunningAggregates, command: str) -> Dict[str, Any]:
+        """
+        Результат команды sum/avg/max/min для закрытого окна.
+        
+        Args:
+            window: агрегаты окна из closed_windows
+            command: sum, avg, max или min
+            
+        Returns:
+            словарь с результатом в разных форматах
+        """
+        return _aggregate_result(window, command, lambda interval: interval)
+
+
+# СЧЕТЧИКИ ЭТАПОВ ОБРАБОТКИ
+
+
+class StageCounters:
+    """
+    Счетчики времени по этапам обработки (load, aggregate, filter, format):
+    число вызовов, суммарное время и число обработанных элементов.
+    """
+    
+    def __init__(self):
+        self.calls: Counter = Counter()
+        self.seconds: Counter = Counter()
+        self.items: Counter = Counter()
+    
+    def record(self, stage: str, seconds: float, items: int = 0) -> None:
+        """Учитывает один вызов этапа"""
+        self.calls[stage] += 1
+        self.seconds[stage] += seconds
+        self.items[stage] += items
+    
+    def reset(self) -> None:
+        self.calls.clear()
+        self.seconds.clear()
+        self.items.clear()
+    
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """
+        Итоги по этапам.
+        
+        Returns:
+            этап -> {"calls", "seconds", "items", "items_per_sec"}
+        """
+        return {
+            stage: {
+                "calls": self.calls[stage],
+                "seconds": self.seconds[stage],
+                "items": self.items[stage],
+                "items_per_sec": (self.items[stage] / self.seconds[stage]
+                                  if self.seconds[stage] > 0 else None)
+            }
+            for stage in self.calls
+        }
+    
+    def print_report(self) -> None:
+        """Выводит итоги по этапам."""
+        print("\nЭтапы обработки:")
+        for stage, stats in self.report().items():
+            print(f"  {stage:10s} вызовов {stats['calls']:>6d}  "
+                  f"{stats['seconds'] * 1000:>10.3f} мс  элементов {stats['items']}")
+
+
+class _StageTimer:
+    """Замер одного вызова этапа; без счетчиков ничего не делает"""
+    
+    __slots__ = ('counters', 'stage', 'items', 'start')
+    
+    def __init__(self, counters: Optional[StageCounters], stage: str):
+        self.counters = counters
+        self.stage = stage
+        self.items = 0
+    
+    def __enter__(self) -> '_StageTimer':
+        if self.counters is not None:
+            self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        if self.counters is not None:
+            self.counters.record(self.stage, time.perf_counter() - self.start, self.items)
+        return False
+
+
+# КЛАСС ДЛЯ ОБРАБОТКИ ВВОДА/ВЫВОДА
+
+
+# Команда -> название операции в результате
+COMMAND_OPERATIONS: Dict[str, str] = {
+    "sum": "Сумма",
+    "avg": "Среднее",
+    "max": "Максимум",
+    "min": "Минимум",
+}
+
+
+class QuerySelector:
+    """
+    Условие отбора интервалов для пакетного запроса: формат,
+    границы длительности и произвольный предикат над интервалом.
+    Одинаковые условия разных команд объединяются в одну выборку.
+    """
+    
+    __slots__ = ('format_code', 'min_seconds', 'max_seconds', 'predicate', 'format_name')
+    
+    def __init__(self, format_name: Optional[str] = None, min_seconds: Optional[float] = None,
+                 max_seconds: Optional[float] = None,
+                 predicate: Optional[Callable[[TimeInterval], bool]] = None):
+        self.format_name = format_name
+        self.format_code = None
+        if format_name is not None:
+            self.format_code = _resolve_format_code(format_name)
+            if self.format_code is None:
+                raise ValueError(f"Неизвестный формат временного интервала: {format_name}")
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.predicate = predicate
     
-    def process_command(self, command: str) -> Dict[str, Any]:
+    def key(self) -> Tuple:
+        """Ключ для объединения одинаковых условий (предикат - по объекту функции)"""
+        return (self.format_code, self.min_seconds, self.max_seconds, id(self.predicate))
+    
+    def is_filtered(self) -> bool:
+        """Есть ли условия, кроме формата"""
+        return self.min_seconds is not None or self.max_seconds is not None or self.predicate is not None
+    
+    def matches_bounds(self, seconds: float, code: int) -> bool:
+        """Подходит ли интервал под формат и границы (без предиката)"""
+        if self.format_code is not None and code != self.format_code:
+            return False
+        if self.min_seconds is not None and seconds < self.min_seconds:
+            return False
+        if self.max_seconds is not None and seconds > self.max_seconds:
+            return False
+        return True
+    
+    def matches(self, seconds: float, code: int, interval: Optional[TimeInterval]) -> bool:
+        """Подходит ли интервал под условие"""
+        return self.matches_bounds(seconds, code) and (self.predicate is None or self.predicate(interval))
+    
+    def describe(self) -> str:
+        """Описание условия для поля operation результата"""
+        parts = []
+        if self.format_name is not None:
+            parts.append(self.format_name)
+        if self.min_seconds is not None:
+            parts.append(f">= {self.min_seconds:g} с")
+        if self.max_seconds is not None:
+            parts.append(f"<= {self.max_seconds:g} с")
+        if self.predicate is not None:
+            parts.append(getattr(self.predicate, "__name__", "фильтр"))
+        return ", ".join(parts)
+
+
+class TimeIntervalProcessor:
+    """
+    Класс для обработки ввода/вывода и взаимодействия с пользователем.
+    """
+    
+    def __init__(self, collection: Optional[Union[TimeIntervalCollection,
+                                                   ColumnarTimeIntervalCollection]] = None,
+                 instrument: bool = False):
+        """
+        Инициализация процессора.
+        
+        Args:
+            collection: коллекция интервалов (по умолчанию пустая TimeIntervalCollection)
+            instrument: вести счетчики времени по этапам (self.counters)
+        """
+        self.collection = collection if collection is not None else TimeIntervalCollection()
+        self.counters: Optional[StageCounters] = StageCounters() if instrument else None
+    
+    def _stage(self, stage: str) -> _StageTimer:
+        """Замер этапа для счетчиков (если они включены)"""
+        return _StageTimer(self.counters, stage)
+    
+    def stage_report(self) -> Dict[str, Dict[str, float]]:
+        """
+        Итоги счетчиков по этапам.
+        
+        Returns:
+            этап -> статистика; пустой словарь, если счетчики выключены
+        """
+        return self.counters.report() if self.counters is not None else {}
+    
+    def load_intervals_from_list(self, intervals_list: List[Dict[str, str]]) -> None:
+        """
+        Загружает интервалы из списка словарей.
+        
+        Args:
+            intervals_list: список словарей вида {'format': 'hms', 'value': '01:30:00'}
+        """
+        with self._stage("load") as timer:
+            for interval_data in intervals_list:
+                try:
+                    self.collection.add_from_string(
+                        interval_data['format'], 
+                        interval_data['value']
+                    )
+                    timer.items += 1
+                except ValueError as e:
+                    print(f"Ошибка при загрузке интервала {interval_data}: {e}")
+    
+    def load_intervals_from_file(self, path: str, file_format: Optional[str] = None) -> LoadReport:
+        """
+        Потоково загружает интервалы из CSV/JSONL файла ('-' - stdin).
+        
+        Args:
+            path: путь к файлу
+            file_format: 'csv' или 'jsonl'; по умолчанию - по расширению
+            
+        Returns:
+            отчет о загрузке с ошибочными строками
+        """
+        with self._stage("load") as timer:
+            report = IntervalFileLoader(self.collection).load_file(path, file_format)
+            timer.items = report.loaded
+        return report
+    
+    def load_files_parallel(self, paths: List[str], workers: Optional[int] = None,
+                            file_format: Optional[str] = None) -> List[LoadReport]:
+        """
+        Параллельно разбирает файлы в сводку IntervalAggregate и добавляет
+        ее к коллекции процессора; коллекция должна быть IntervalAggregate.
+        
+        Args:
+            paths: пути к CSV/JSONL файлам
+            workers: число процессов
+            file_format: 'csv' или 'jsonl'; по умолчанию - по расширению
+            
+        Returns:
+            отчеты о загрузке по каждому файлу
+        """
+        if not isinstance(self.collection, IntervalAggregate):
+            raise ValueError("Параллельная загрузка требует коллекцию IntervalAggregate")
+        with self._stage("load") as timer:
+            aggregate, reports = aggregate_files_parallel(paths, workers, file_format)
+            self.collection.merge(aggregate)
+            timer.items = aggregate.get_count()
+        return reports
+    
+    def process_command(self, command: str, format_name: Optional[str] = None) -> Dict[str, Any]:
         """
         Обрабатывает команду пользователя.
+        Агрегаты коллекции поддерживаются при добавлении и удалении,
+        поэтому каждая команда выполняется за O(1).
         
         Args:
             command: команда (sum, avg, max, min)
+            format_name: если задан, команда считается только по интервалам
+                этого формата (через индекс по форматам)
             
         Returns:
             словарь с результатом выполнения команды
         """
-        command = command.lower().strip()
-        
-        if command == "sum":
-            result = self.collection.sum()
-            result["operation"] = "Сумма"
-            return result
-        elif command == "avg":
-            result = self.collection.avg()
-            result["operation"] = "Среднее"
-            return result
-        elif command == "max":
-            result = self.collection.max()
-            result["operation"] = "Максимум"
-            return result
-        elif command == "min":
-            result = self.collection.min()
-            result["operation"] = "Минимум"
-            return result
-        else:
+        with self._stage("aggregate") as timer:
+            timer.items = 1
+            return self._process_command(command.lower().strip(), format_name)
+    
+    def _process_command(self, command: str, format_name: Optional[str]) -> Dict[str, Any]:
+        """Выполнение одной команды (без счетчиков)"""
+        operation = COMMAND_OPERATIONS.get(command)
+        if operation is None:
             raise ValueError(f"Неизвестная команда: {command}")
+        if format_name is not None:
+            result = self.collection.aggregate_by_format(format_name, command)
+            result["operation"] = f"{operation} ({format_name})"
+        else:
+            result = getattr(self.collection, command)()
+            result["operation"] = operation
+        return result
+    
+    def process_commands(self, queries: List[Union[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Выполняет пакет команд. Запрос - строка команды или словарь
+        {"command": ..., "format": ..., "min_seconds": ..., "max_seconds": ...,
+        "predicate": ..., "name": ...}.
+        
+        Команды без условий и только с форматом берутся из поддерживаемых
+        агрегатов за O(1). Остальные группируются по одинаковым условиям,
+        и все выборки считаются за один общий проход по данным.
+        
+        Args:
+            queries: список запросов
+            
+        Returns:
+            словари результатов в порядке запросов (как у process_command)
+        """
+        plans = []
+        selectors: Dict[Tuple, int] = {}  # ключ условия -> номер выборки
+        grouped: List[QuerySelector] = []
+        for query in queries:
+            if isinstance(query, str):
+                query = {"command": query}
+            command = query["command"].lower().strip()
+            if command not in COMMAND_OPERATIONS:
+                raise ValueError(f"Неизвестная команда: {command}")
+            selector = QuerySelector(query.get("format"), query.get("min_seconds"),
+                                     query.get("max_seconds"), query.get("predicate"))
+            group = None
+            if selector.is_filtered():
+                group = selectors.get(selector.key())
+                if group is None:
+                    group = selectors[selector.key()] = len(grouped)
+                    grouped.append(selector)
+            plans.append((command, selector, group, query.get("name")))
+        
+        if grouped and not hasattr(self.collection, "query_aggregates"):
+            raise ValueError("Фильтры в пакетном запросе требуют коллекцию с интервалами")
+        with self._stage("filter") as timer:
+            timer.items = len(grouped)
+            scanned = self.collection.query_aggregates(grouped) if grouped else []
+        
+        results = []
+        for command, selector, group, name in plans:
+            if group is None:
+                result = self.process_command(command, selector.format_name)
+            else:
+                result = _aggregate_result(scanned[group], command, self.collection.resolve_item)
+                result["operation"] = f"{COMMAND_OPERATIONS[command]} ({selector.describe()})"
+            if name is not None:
+                result["operation"] = name
+            results.append(result)
+        return results
     
     def print_result(self, result: Dict[str, Any]) -> None:
         """
@@ -553,15 +3247,17 @@ class TimeIntervalProcessor:
         Args:
             result: словарь с результатом
         """
-        operation = result.get("operation", "Результат")
-        
-        print(f"\n{operation}:")
-        print(f"  В секундах: {result['seconds']:.2f} с")
-        print(f"  Форматировано: {result['formatted']}")
-        print(f"  Формат ЧЧ:ММ:СС: {result['hms']}")
-        
-        if "original" in result and result["original"]:
-            print(f"  Исходный интервал: {result['original']}")
+        with self._stage("format") as timer:
+            timer.items = 1
+            operation = result.get("operation", "Результат")
+            
+            print(f"\n{operation}:")
+            print(f"  В секундах: {result['seconds']:.2f} с")
+            print(f"  Форматировано: {result['formatted']}")
+            print(f"  Формат ЧЧ:ММ:СС: {result['hms']}")
+            
+            if "original" in result and result["original"]:
+                print(f"  Исходный интервал: {result['original']}")
 
 
 # ПРИМЕР ИСПОЛЬЗОВАНИЯ
@@ -676,6 +3372,212 @@ def main():
     sum_result = manual_collection.sum()
     print(f"\nСумма всех интервалов: {sum_result['formatted']}")
     
+    # Пример 6: Колоночная коллекция
+    print("\n" + "="*70)
+    print("ПРИМЕР 6: КОЛОНОЧНАЯ КОЛЛЕКЦИЯ")
+    print("="*70)
+    
+    columnar_processor = TimeIntervalProcessor(ColumnarTimeIntervalCollection(keep_values=True))
+    columnar_processor.load_intervals_from_list(intervals_data)
+    columnar_processor.collection.print_all()
+    
+    for command in commands:
+        columnar_processor.print_result(columnar_processor.process_command(command))
+    
+    # По умолчанию без исходных строк: 9 байт на интервал
+    compact = ColumnarTimeIntervalCollection()
+    for data in intervals_data:
+        compact.add_from_string(data["format"], data["value"])
+    print(f"\nБез исходных строк: {compact.get_count()} интервалов, "
+          f"{compact.seconds.itemsize + compact.codes.itemsize} байт на интервал")
+    print(f"Максимум: {compact.max()['original']}")
+    
+    # Пример 7: Потоковая загрузка из файла
+    print("\n" + "="*70)
+    print("ПРИМЕР 7: ПОТОКОВАЯ ЗАГРУЗКА ИЗ CSV И JSONL")
+    print("="*70)
+    
+    csv_lines = "format,value\nhms,00:30:00\nms,45000\nhours,abc\nseconds,120\nweeks,3\n"
+    jsonl_lines = '{"format": "minsec", "value": "2 30"}\n{"format": "hours", "value": 1.5}\n{"oops": 1}\n'
+    file_processor = TimeIntervalProcessor(ColumnarTimeIntervalCollection())
+    file_loader = IntervalFileLoader(file_processor.collection)
+    file_loader.load_stream(io.StringIO(csv_lines), 'csv', source='intervals.csv').print_report()
+    file_loader.load_stream(io.StringIO(jsonl_lines), 'jsonl', source='intervals.jsonl').print_report()
+    file_processor.print_result(file_processor.process_command("sum"))
+    
+    # Пример 8: Накапливаемые агрегаты при добавлении и удалении
+    print("\n" + "="*70)
+    print("ПРИМЕР 8: НАКАПЛИВАЕМЫЕ АГРЕГАТЫ")
+    print("="*70)
+    
+    live_processor = TimeIntervalProcessor()
+    live_processor.load_intervals_from_list(intervals_data)
+    print(f"\nМаксимум до удаления: {live_processor.process_command('max')['original']}")
+    live_processor.collection.remove_interval(live_processor.collection.intervals[3])
+    print(f"Максимум после удаления: {live_processor.process_command('max')['original']}")
+    print(f"Сумма: {live_processor.process_command('sum')['formatted']}, "
+          f"интервалов: {live_processor.collection.aggregates.count}")
+    
+    # Пример 9: Диапазоны и порядковые статистики по отсортированному индексу
+    print("\n" + "="*70)
+    print("ПРИМЕР 9: ДИАПАЗОНЫ, МЕДИАНА И ПРОЦЕНТИЛИ")
+    print("="*70)
+    
+    collection = processor.collection
+    print(f"\nИнтервалы от 1 до 60 минут ({collection.count_in_range(60, 3600)} шт.):")
+    for i, interval in enumerate(collection.range_by_seconds(60, 3600), 1):
+        print(f"  {i}. {interval}")
+    print(f"\nМедиана: {collection.median():.2f} с")
+    print(f"90-й процентиль: {collection.percentile(90):.2f} с")
+    print(f"Второй по длительности снизу: {collection.kth_smallest(1)}")
+    
+    # Пример 10: Поиск и агрегаты по формату через индекс
+    print("\n" + "="*70)
+    print("ПРИМЕР 10: АГРЕГАТЫ ПО ФОРМАТУ")
+    print("="*70)
+    
+    for format_name in ("hms", "Миллисекунды"):
+        for command in ("sum", "max"):
+            processor.print_result(processor.process_command(command, format_name))
+    
+    # Пример 11: Кэш разбора повторяющихся значений
+    print("\n" + "="*70)
+    print("ПРИМЕР 11: КЭШ РАЗБОРА В ФАБРИКЕ")
+    print("="*70)
+    
+    cache = TimeIntervalFactory.configure_parse_cache(1024)
+    repeated = TimeIntervalCollection()
+    for _ in range(1000):
+        for format_type, value in (("hms", "00:30:00"), ("seconds", "3600"), ("minsec", "1 30")):
+            repeated.add_from_string(format_type, value)
+    print(f"\nЗагружено {repeated.get_count()} интервалов, сумма {repeated.sum()['formatted']}")
+    print(f"Статистика кэша: {cache.stats()}")
+    
+    # Пример 12: Параллельная загрузка нескольких файлов в сводку
+    print("\n" + "="*70)
+    print("ПРИМЕР 12: ПАРАЛЛЕЛЬНАЯ ЗАГРУЗКА ФАЙЛОВ")
+    print("="*70)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for number in range(4):
+            path = os.path.join(directory, f"intervals_{number}.csv")
+            with open(path, "w", encoding="utf-8") as file:
+                file.write("format,value\n")
+                for data in intervals_data:
+                    file.write(f"{data['format']},{data['value']}\n")
+            paths.append(path)
+        
+        summary_processor = TimeIntervalProcessor(IntervalAggregate())
+        reports = summary_processor.load_files_parallel(paths, workers=2)
+    
+    print(f"\nФайлов: {len(reports)}, интервалов: {summary_processor.collection.get_count()}")
+    for command in commands:
+        summary_processor.print_result(summary_processor.process_command(command))
+    print(f"\nПо форматам: {summary_processor.collection.format_counts()}")
+    print("Гистограмма (секунды):")
+    for low, high, count in summary_processor.collection.histogram_buckets():
+        print(f"  [{low:g}, {high:g}): {count}")
+    
+    # Пример 13: Потоковая статистика с постоянной памятью
+    print("\n" + "="*70)
+    print("ПРИМЕР 13: ПОТОКОВАЯ СТАТИСТИКА И СКЕТЧ КВАНТИЛЕЙ")
+    print("="*70)
+    
+    # Два "рабочих" считают свои части потока, затем сводки объединяются
+    workers_stats = [IntervalAggregate(), IntervalAggregate()]
+    exact = TimeIntervalCollection()
+    for number in range(20000):
+        value = str((number * 7919) % 100000)
+        workers_stats[number % 2].add_from_string("ms", value)
+        exact.add_from_string("ms", value)
+    stream_stats = workers_stats[0].merge(workers_stats[1])
+    
+    print(f"\nИнтервалов: {stream_stats.get_count()}, корзин скетча: {len(stream_stats.sketch.positive)}")
+    for percent in (50, 90, 99):
+        print(f"  {percent}-й процентиль: скетч {stream_stats.percentile(percent):.3f} с, "
+              f"точно {exact.percentile(percent):.3f} с")
+    
+    # Пример 14: Двоичный снимок и открытие через mmap
+    print("\n" + "="*70)
+    print("ПРИМЕР 14: ДВОИЧНЫЙ СНИМОК КОЛЛЕКЦИИ")
+    print("="*70)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot_path = os.path.join(directory, "intervals.snap")
+        processor.collection.save_snapshot(snapshot_path)
+        print(f"\nСнимок: {os.path.getsize(snapshot_path)} байт для {processor.collection.get_count()} интервалов")
+        
+        mapped_collection = ColumnarTimeIntervalCollection.load_snapshot(snapshot_path)
+        mapped_processor = TimeIntervalProcessor(mapped_collection)
+        for command in ("sum", "max"):
+            mapped_processor.print_result(mapped_processor.process_command(command))
+        print(f"\nИнтервалы в формате HMS: {[str(i) for i in mapped_collection.find_by_format('hms')]}")
+        mapped_collection.close()
+    
+    # Пример 15: Агрегаты по временным окнам
+    print("\n" + "="*70)
+    print("ПРИМЕР 15: ОКНА ПО ВРЕМЕНИ (ПОМИНУТНЫЕ И СКОЛЬЗЯЩИЕ)")
+    print("="*70)
+    
+    per_minute = WindowedAggregator(window_seconds=60)
+    rolling = WindowedAggregator(window_seconds=180, step_seconds=60)
+    start = datetime(2025, 1, 1, 12, 0, 0)
+    for second in range(0, 300, 15):
+        latency_ms = str(100 + (second * 37) % 400)
+        for aggregator in (per_minute, rolling):
+            aggregator.add_from_string(start + timedelta(seconds=second), "ms", latency_ms)
+    for aggregator in (per_minute, rolling):
+        aggregator.add_from_string(start + timedelta(seconds=290), "seconds", "0.05")
+        # Окна 12:00-12:03 и 12:01-12:04 уже закрыты: событие отбрасывается
+        aggregator.add_from_string(start + timedelta(seconds=150), "ms", "900")
+    print(f"\nТекущее окно: максимум ms {rolling.aggregate_by_format('ms', 'max')['seconds']:.3f} с, "
+          f"сумма seconds {rolling.aggregate_by_format('seconds', 'sum')['seconds']:.3f} с, "
+          f"отброшено опоздавших событий: {rolling.late_events}")
+    per_minute.flush()
+    rolling.flush()
+    
+    print("\nПоминутно (среднее / максимум):")
+    for window_start, window_end, window in per_minute.closed_windows:
+        print(f"  {datetime.fromtimestamp(window_start):%H:%M}-{datetime.fromtimestamp(window_end):%H:%M}: "
+              f"{window.total / window.count:.3f} с / {window.max_seconds:.3f} с")
+    print("Скользящее окно 3 минуты с шагом 1 минута (количество / сумма):")
+    for window_start, window_end, window in rolling.closed_windows:
+        result = WindowedAggregator.window_result(window, "sum")
+        print(f"  {datetime.fromtimestamp(window_start):%H:%M}-{datetime.fromtimestamp(window_end):%H:%M}: "
+              f"{window.count} / {result['seconds']:.3f} с")
+    
+    # Пример 16: Пакет команд с фильтрами за один проход
+    print("\n" + "="*70)
+    print("ПРИМЕР 16: ПАКЕТНЫЙ ЗАПРОС")
+    print("="*70)
+    
+    def whole_minutes(interval: TimeInterval) -> bool:
+        return interval.get_seconds() % 60 == 0
+    
+    report_queries = [
+        "sum",
+        {"command": "avg", "format": "hms"},
+        {"command": "sum", "min_seconds": 60},
+        {"command": "max", "min_seconds": 60, "max_seconds": 3600},
+        {"command": "min", "min_seconds": 60},
+        {"command": "avg", "predicate": whole_minutes, "name": "Среднее целых минут"},
+    ]
+    for result in processor.process_commands(report_queries):
+        processor.print_result(result)
+    
+    # Пример 17: Счетчики времени по этапам
+    print("\n" + "="*70)
+    print("ПРИМЕР 17: СЧЕТЧИКИ ЭТАПОВ ОБРАБОТКИ")
+    print("="*70)
+    
+    instrumented = TimeIntervalProcessor(ColumnarTimeIntervalCollection(), instrument=True)
+    instrumented.load_intervals_from_list(intervals_data)
+    for command in commands:
+        instrumented.process_command(command)
+    instrumented.process_commands(report_queries)
+    instrumented.counters.print_report()
+    
     print("\n" + "="*70)
     print("ДЕМОНСТРАЦИЯ ЗАВЕРШЕНА")
     print("="*70)